@@ -1,69 +1,36 @@
-import asyncio
-from contextlib import asynccontextmanager
-import shelve
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import asdict
 from pathlib import Path
 
-import sqlmodel
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import PlainTextResponse
 from loguru import logger
 from starlette.responses import HTMLResponse, RedirectResponse
 from starlette.staticfiles import StaticFiles
-from starlette.templating import Jinja2Templates
 
-from . import dtg_types
 from .core import database
-from .guru_config import GuruConfig, guru_settings
+from .core.lease import LeaseHeld
 from .dtb_htmx.episode_route import router as ep_router
 from .dtb_htmx.guru_route import router as guru_router
-from .dtg_bot import DTG
+from .dtb_htmx.typeahead_route import router as typeahead_router
+from .dtb_htmx.typeahead_route import warm_typeahead
+from .guru_config import guru_settings
+from .worker import running_bot
 
 THIS_DIR = Path(__file__).resolve().parent
 
 
-def db_from_shelf(session: sqlmodel.Session, settings: GuruConfig = guru_settings()):
-    with shelve.open(str(settings.backup_shelf)) as shelf:
-        episodes = shelf.get('episode')
-        gurus = shelf.get('guru')
-    episodes = sorted(episodes, key=lambda x: x.date, reverse=True)
-    gurus = sorted(gurus, key=lambda x: x.id)
-    session.add_all(episodes)
-    session.add_all(gurus)
-    session.commit()
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # noinspection PyArgumentList
-    async with DTG() as dtg:
-        try:
-            database.create_db()
-
-            with sqlmodel.Session(database.engine_()) as session:
-                if dtg.g_settings.restore_from_shelf:
-                    db_from_shelf(session)
-                if dtg.g_settings.trim_db:
-                    database.trim_db(session)
-            logger.info('tables created')
-            main_task = asyncio.create_task(dtg.run())
-            yield
-
-        finally:
-            await shelf_db()
-            await dtg.kill()
-            main_task.cancel()
-            await main_task
-
-
-async def shelf_db():
-    g_sett = guru_settings()
-    with sqlmodel.Session(database.engine_()) as session:
-        with shelve.open(g_sett.backup_shelf) as shelf:
-            for model_name, mapping in dtg_types.models_map.items():
-                result = session.exec(sqlmodel.select(mapping.db_model))
-                outputs = [mapping.output.model_validate(_, from_attributes=True) for _ in result.all()]
-                shelf[model_name] = outputs
-    logger.info(f'DB shelved to {g_sett.backup_shelf}')
+    settings = guru_settings()
+    async with AsyncExitStack() as stack:
+        if settings.embed_bot:
+            try:
+                app.state.dtg, _ = await stack.enter_async_context(running_bot(settings))
+            except LeaseHeld as e:
+                logger.warning(f'{e}, serving read only')
+        await database.run_db(warm_typeahead)
+        yield
 
 
 # async def shelf_db():
@@ -76,10 +43,10 @@ async def shelf_db():
 
 app = FastAPI(lifespan=lifespan)
 app.mount('/static', StaticFiles(directory=THIS_DIR / 'ui/static'), name='static')
-templates = Jinja2Templates(directory='/ui/templates')
 
 app.include_router(ep_router, prefix='/eps')
 app.include_router(guru_router, prefix='/guru')
+app.include_router(typeahead_router, prefix='/typeahead')
 
 
 @app.get('/robots.txt', response_class=PlainTextResponse)
@@ -92,6 +59,28 @@ async def favicon_ico() -> str:
     return 'page not found'
 
 
+@app.get('/stats/queues')
+async def queue_stats(request: Request) -> dict[str, dict]:
+    if (dtg := getattr(request.app.state, 'dtg', None)) is None:
+        return {}
+    return dtg.queue_stats()
+
+
+@app.get('/stats/polls')
+async def poll_stats(request: Request) -> dict[str, dict]:
+    if (dtg := getattr(request.app.state, 'dtg', None)) is None:
+        return {}
+    return dtg.poll_stats()
+
+
+@app.get('/stats/http_cache')
+async def http_cache_stats(request: Request) -> dict:
+    dtg = getattr(request.app.state, 'dtg', None)
+    if dtg is None or dtg.http_cache_stats is None:
+        return {}
+    return asdict(dtg.http_cache_stats) | {'hit_rate': dtg.http_cache_stats.hit_rate}
+
+
 @app.get('/', response_class=HTMLResponse)
 async def index():
     logger.info('index')
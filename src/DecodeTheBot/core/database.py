@@ -1,41 +1,273 @@
+import asyncio
 import functools
+import json
 import pathlib
+from collections.abc import Collection
+from concurrent.futures import ThreadPoolExecutor
 
+import sqlalchemy as sqa
 from loguru import logger
-from sqlalchemy import create_engine, text
-from sqlmodel import SQLModel, Session
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.dialects import sqlite
+from sqlmodel import Session, SQLModel, select, update
 
-from DecodeTheBot.guru_config import guru_settings
+from DecodeTheBot.core import search
+from DecodeTheBot.core.dedupe import content_hash
+from DecodeTheBot.guru_config import GuruConfig, guru_settings
+from DecodeTheBot.models.meta import DBMeta, utcnow
+
+# all bot writes run on this one thread so they never block the event loop or contend with each other
+WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
 
 
 @functools.lru_cache
-def get_db_url():
+def get_db_url(read_only: bool = False):
     g_sett = guru_settings()
     db_loc = g_sett.guru_db
     logger.info(f'USING DB FILE: {db_loc}')
     db_path = pathlib.Path(db_loc)
+    if read_only:
+        return f'sqlite:///file:{db_path.resolve()}?mode=ro&uri=true'
     return f'sqlite:///{db_path}'
 
 
+def sqlite_pragmas(settings: GuruConfig) -> dict[str, str | int]:
+    """Connection pragmas from the sqlite_* settings"""
+    return {
+        'journal_mode': settings.sqlite_journal_mode,
+        'synchronous': settings.sqlite_synchronous,
+        'cache_size': settings.sqlite_cache_size,
+        'mmap_size': settings.sqlite_mmap_size,
+        'busy_timeout': settings.sqlite_busy_timeout,
+        'temp_store': settings.sqlite_temp_store,
+    }
+
+
+def make_engine(db_url: str, pragmas: dict[str, str | int] | None = None, read_only: bool = False):
+    """Create a SQLite engine applying pragmas on every new connection
+
+    Transactions are begun explicitly rather than by pysqlite, so SAVEPOINTs nest inside the session transaction.
+    Read-only engines skip journal_mode (it can't be set without write access) and set query_only.
+    """
+    connect_args = {'check_same_thread': False}
+    engine = create_engine(db_url, echo=False, connect_args=connect_args)
+    pragmas = dict(pragmas or {})
+    if read_only:
+        pragmas.pop('journal_mode', None)
+        pragmas['query_only'] = 1
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma}={value}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(conn):
+        conn.exec_driver_sql('BEGIN')
+
+    return engine
+
+
 @functools.lru_cache
 def engine_():
-    db_url = get_db_url()
-    connect_args = {'check_same_thread': False}
-    return create_engine(db_url, echo=False, connect_args=connect_args)
+    """Engine for the bot, the single writer"""
+    return make_engine(get_db_url(), sqlite_pragmas(guru_settings()))
 
 
-def get_session(engine=None) -> Session:
+@functools.lru_cache
+def read_engine_():
+    """Read-only engine for the web routes"""
+    return make_engine(get_db_url(read_only=True), sqlite_pragmas(guru_settings()), read_only=True)
+
+
+async def run_db(func, /, *args, **kwargs):
+    """Run blocking database work in a worker thread"""
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+async def run_write(func, /, *args, **kwargs):
+    """Run blocking database writes on the single writer thread"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(WRITER, functools.partial(func, *args, **kwargs))
+
+
+async def get_session(engine=None) -> Session:
     if engine is None:
-        engine = engine_()
-    with Session(engine) as session:
+        engine = read_engine_()
+    session = Session(engine)
+    try:
         yield session
-    session.close()
+    finally:
+        await run_db(session.close)
 
 
 def create_db(engine=None):
     if engine is None:
         engine = engine_()
     SQLModel.metadata.create_all(engine)
+    migrate_db(engine)
+
+
+def migrate_db(engine):
+    """Bring databases created by older versions up to the current schema"""
+    added = add_missing_columns(engine)
+    backfill_content_hashes(engine)
+    create_missing_indexes(engine)
+    search.create_fts(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(DBMeta).prefix_with('OR IGNORE').values(id=1, data_version=0, updated=utcnow()))
+    if 'guru' in added:
+        with Session(engine) as session:
+            recount_interest(session)
+            session.commit()
+
+
+def add_missing_columns(engine) -> dict[str, list[str]]:
+    """create_all skips columns added to tables that already exist, so add them, with their scalar defaults"""
+    inspector = sqa.inspect(engine)
+    added = {}
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {_['name'] for _ in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}'
+                if column.default is not None and column.default.is_scalar:
+                    default = sqa.literal(column.default.arg).compile(
+                        dialect=engine.dialect, compile_kwargs={'literal_binds': True}
+                    )
+                    ddl += f' NOT NULL DEFAULT {default}'
+                conn.execute(text(ddl))
+                added.setdefault(table.name, []).append(column.name)
+                logger.info(f'Added column {table.name}.{column.name}')
+    return added
+
+
+def backfill_content_hashes(engine):
+    """Hash rows stored before the content_hash column existed, so its unique index can be built
+
+    Rows duplicating an earlier row are left without a hash, they predate database-side dedupe.
+    """
+    from DecodeTheBot.models.episode_m import Episode
+    from DecodeTheBot.models.reddit_m import RedditThread
+
+    for model in (Episode, RedditThread):
+        with Session(engine) as session:
+            rows = session.exec(
+                select(model.id, *(getattr(model, _) for _ in model.hash_fields))
+                .where(model.content_hash.is_(None))
+                .order_by(model.id)
+            ).all()
+            if not rows:
+                continue
+            seen = set(session.exec(select(model.content_hash).where(model.content_hash.is_not(None))).all())
+            hashes = []
+            for id_, *values in rows:
+                if (hash_ := content_hash(*values)) not in seen:
+                    seen.add(hash_)
+                    hashes.append({'row_id': id_, 'hash': hash_})
+            session.execute(
+                update(model.__table__)
+                .where(model.__table__.c.id == sqa.bindparam('row_id'))
+                .values(content_hash=sqa.bindparam('hash')),
+                hashes,
+            )
+            session.commit()
+            logger.info(f'Hashed {len(hashes)} {model.__name__} rows, {len(rows) - len(hashes)} duplicates unhashed')
+
+
+def insert_new(session: Session, model, items: list, key: str = 'content_hash') -> list:
+    """Insert items in one statement, skipping any that clash with a stored row on a unique column
+
+    Items built without validation have no content_hash yet, it is filled from get_hash before inserting.
+
+    Returns:
+        list: The items inserted, with their ids set
+    """
+    if key == 'content_hash':
+        for item in items:
+            item.content_hash = item.get_hash
+    keys, unique = set(), []
+    for item in items:
+        if getattr(item, key) not in keys:
+            keys.add(getattr(item, key))
+            unique.append(item)
+    table = model.__table__
+    rows = [{column.name: getattr(item, column.name) for column in table.columns} for item in unique]
+    if not rows:
+        return []
+    stmt = sqlite.insert(table).on_conflict_do_nothing().returning(table.c.id, table.c[key])
+    ids = {key_: id_ for id_, key_ in session.execute(stmt, rows)}
+    inserted = [item for item in unique if getattr(item, key) in ids]
+    for item in inserted:
+        item.id = ids[getattr(item, key)]
+    return inserted
+
+
+def create_missing_indexes(engine):
+    """create_all skips indexes on tables that already exist, so add any that are missing"""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def recount_interest(session: Session):
+    """Recompute every guru's link counts from the link tables, after bulk changes made outside the bot"""
+    # textual statements don't autoflush, so write out links added to the session first
+    session.flush()
+    session.execute(
+        text(
+            'UPDATE guru SET '
+            'episode_count = (SELECT count(*) FROM guruepisodelink l WHERE l.guru_id = guru.id), '
+            'thread_count = (SELECT count(*) FROM redditthreadgurulink l WHERE l.guru_id = guru.id)'
+        )
+    )
+    session.execute(text('UPDATE guru SET interest = episode_count + thread_count'))
+
+
+def compact_submissions(session: Session, fields: Collection[str], batch_size: int = 1000) -> int:
+    """Drop attributes outside fields from thread submissions stored before the projection, returns threads changed
+
+    Run VACUUM afterwards to return the freed pages to the filesystem.
+    """
+    fields = list(fields)
+    stale = text(
+        'SELECT id FROM redditthread WHERE EXISTS '
+        '(SELECT 1 FROM json_each(redditthread.submission) WHERE key NOT IN :fields)'
+    ).bindparams(sqa.bindparam('fields', expanding=True))
+    ids = session.execute(stale, {'fields': fields}).scalars().all()
+    load = text('SELECT id, submission FROM redditthread WHERE id IN :ids').bindparams(
+        sqa.bindparam('ids', expanding=True)
+    )
+    store = text('UPDATE redditthread SET submission = :submission WHERE id = :id')
+    for start in range(0, len(ids), batch_size):
+        rows = session.execute(load, {'ids': ids[start : start + batch_size]}).all()
+        session.execute(
+            store,
+            [
+                {'id': id_, 'submission': json.dumps({k: v for k, v in json.loads(sub).items() if k in fields})}
+                for id_, sub in rows
+            ],
+        )
+    if ids:
+        logger.info(f'Compacted {len(ids)} reddit thread submissions')
+    return len(ids)
+
+
+def bump_data_version(session: Session):
+    """Record a change to the data, in the caller's transaction"""
+    session.execute(update(DBMeta).where(DBMeta.id == 1).values(data_version=DBMeta.data_version + 1, updated=utcnow()))
+
+
+def data_version(session: Session) -> DBMeta:
+    """The current data version and when it last changed"""
+    return session.exec(select(DBMeta).where(DBMeta.id == 1)).one()
 
 
 def trim_db(session):
@@ -0,0 +1,75 @@
+import functools
+from collections.abc import Iterable
+
+import pydantic as _p
+import sqlmodel as sqm
+from loguru import logger
+from suppawt import get_values
+
+
+def content_hash(*values) -> str:
+    """Hash identifying an item by the values that make it a duplicate, stored in the content_hash column"""
+    return get_values.hash_simple_md5([str(_) for _ in values])
+
+
+@functools.lru_cache
+def _adapter(annotation) -> _p.TypeAdapter:
+    return _p.TypeAdapter(annotation)
+
+
+def with_content_hash(model, data):
+    """data for model with content_hash filled from its hash_fields, for a mode='before' model validator
+
+    Table models can't be assigned to from an after validator, so the hash fields are coerced to their annotated
+    types here, hashing the same values get_hash sees on the validated instance. Objects are read by attribute.
+    """
+    if not isinstance(data, dict):
+        data = {_: getattr(data, _) for _ in model.model_fields if hasattr(data, _)}
+    if data.get('content_hash') is None and all(_ in data for _ in model.hash_fields):
+        fields = model.model_fields
+        values = [_adapter(fields[_].annotation).validate_python(data[_]) for _ in model.hash_fields]
+        data = {**data, 'content_hash': content_hash(*values)}
+    return data
+
+
+class HashIndex:
+    """In-memory index of content hashes for duplicate detection
+
+    Attributes:
+        committed (set[str]): hashes of rows committed to the database
+        pending (set[str]): hashes of items queued but not yet committed
+    """
+
+    def __init__(self, hashes: Iterable[str] = ()):
+        self.committed: set[str] = set(hashes)
+        self.pending: set[str] = set()
+
+    def __contains__(self, hash_: str) -> bool:
+        return hash_ in self.committed or hash_ in self.pending
+
+    def __len__(self) -> int:
+        return len(self.committed)
+
+    @classmethod
+    def from_session(cls, session: sqm.Session, model) -> 'HashIndex':
+        """Build an index from the stored hashes of model"""
+        index = cls(session.exec(sqm.select(model.content_hash).where(model.content_hash.is_not(None))).all())
+        logger.debug(f'Loaded {len(index)} {model.__name__} hashes')
+        return index
+
+    def reserve(self, hash_: str):
+        """Mark a hash as queued so it is not enqueued twice before commit"""
+        self.pending.add(hash_)
+
+    def release(self, hash_: str):
+        """Forget a queued hash whose item was not committed"""
+        self.pending.discard(hash_)
+
+    def commit(self, hash_: str):
+        """Record a hash as committed
+
+        Runs on the writer thread while the event loop checks membership, so the hash is in committed before it
+        leaves pending and is never in neither.
+        """
+        self.committed.add(hash_)
+        self.pending.discard(hash_)
@@ -0,0 +1,59 @@
+"""Persistence for the bot's in-memory queues
+
+Items are written to the queueditem table before they are queued and deleted by the batch commit that stores
+them, so delivery is at least once: anything queued when the bot stops, cleanly or not, is loaded again on the
+next start instead of being fetched again. Payloads are pickled model dumps, as in the backup shelf.
+"""
+
+import pickle
+from dataclasses import dataclass
+
+import pydantic as _p
+import sqlmodel as sqm
+from loguru import logger
+from sqlalchemy import delete, insert
+
+from DecodeTheBot.models.meta import QueuedItem, utcnow
+
+
+@dataclass(frozen=True, slots=True)
+class QueueEntry:
+    """An item in a bot queue, with the id of the row persisting it"""
+
+    id: int
+    item: _p.BaseModel
+
+
+def persist(session: sqm.Session, queue: str, items: list) -> list[QueueEntry]:
+    """Store items for queue and commit, returning them as entries in the same order"""
+    if not items:
+        return []
+    now = utcnow()
+    rows = [{'queue': queue, 'payload': pickle.dumps(_.model_dump()), 'enqueued': now} for _ in items]
+    # SQLite numbers the rows of an insert in order, asking SQLAlchemy to sort RETURNING costs a statement per row
+    ids = sorted(session.execute(insert(QueuedItem).returning(QueuedItem.id), rows).scalars().all())
+    entries = [QueueEntry(id_, item) for id_, item in zip(ids, items)]
+    session.commit()
+    return entries
+
+
+def pending(session: sqm.Session, queue: str, model) -> list[QueueEntry]:
+    """Entries stored for queue and not yet acknowledged, oldest first"""
+    entries = []
+    rows = session.exec(
+        sqm.select(QueuedItem.id, QueuedItem.payload).where(QueuedItem.queue == queue).order_by(QueuedItem.id)
+    )
+    for id_, payload in rows.all():
+        try:
+            entries.append(QueueEntry(id_, model.model_validate(pickle.loads(payload))))
+        except (pickle.UnpicklingError, _p.ValidationError) as e:
+            logger.error(f'Dropping unreadable {queue} queue item {id_}: {e}')
+            ack(session, [id_])
+    session.commit()
+    return entries
+
+
+def ack(session: sqm.Session, ids: list[int]):
+    """Delete the rows of processed entries, in the caller's transaction"""
+    if ids:
+        session.execute(delete(QueuedItem).where(QueuedItem.id.in_(ids)))
@@ -0,0 +1,71 @@
+"""HTTP client for the podcast scraper
+
+The scraper makes many requests to one host one after another, so connections are kept alive and reused
+between requests, the pool caps connections per host, and every request has connect and read timeouts
+so a stalled server fails the poll instead of hanging it.
+fetch_ordered runs a sequence of page requests concurrently through the pool and returns them in order.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Iterable
+
+import aiohttp
+
+from DecodeTheBot.core.http_cache import CachingSession, HttpCache
+from DecodeTheBot.guru_config import GuruConfig
+
+
+def client_session(settings: GuruConfig) -> aiohttp.ClientSession:
+    """Session with a keep-alive pool of settings.http_connections connections per host and the http_* timeouts"""
+    connector = aiohttp.TCPConnector(
+        limit=settings.http_connections,
+        limit_per_host=settings.http_connections,
+        keepalive_timeout=settings.http_keepalive,
+        ttl_dns_cache=300,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings.http_total_timeout,
+        connect=settings.http_connect_timeout,
+        sock_read=settings.http_read_timeout,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def scraper_session(settings: GuruConfig) -> aiohttp.ClientSession | CachingSession:
+    """client_session, behind the on-disk http cache unless http_cache_bytes is 0"""
+    session = client_session(settings)
+    if not settings.http_cache_bytes:
+        return session
+    return CachingSession(session, HttpCache(settings.http_cache_file, settings.http_cache_bytes))
+
+
+async def fetch_ordered(
+    session: aiohttp.ClientSession | CachingSession, urls: Iterable[str], limit: int
+) -> AsyncIterator[bytes]:
+    """Bodies of urls in the order given, with up to limit requests in flight
+
+    Requests start ahead of the caller, up to twice limit pages are held, so a slow page delays those after it
+    reaching the caller but not their download. Stopping early cancels the requests still outstanding.
+
+    Raises:
+        aiohttp.ClientResponseError: For an error status, once the caller reaches that page
+    """
+    running = asyncio.Semaphore(limit)
+
+    async def fetch(url: str) -> bytes:
+        async with running, session.get(url) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    urls, window = iter(urls), deque()
+    try:
+        while True:
+            while len(window) < 2 * limit and (url := next(urls, None)) is not None:
+                window.append(asyncio.create_task(fetch(url)))
+            if not window:
+                return
+            yield await window.popleft()
+    finally:
+        for task in window:
+            task.cancel()
@@ -0,0 +1,240 @@
+"""On-disk HTTP cache with conditional revalidation for the podcast scraper
+
+Pages are stored with their ETag and Last-Modified validators. A repeat GET for a stored page sends them back as
+If-None-Match / If-Modified-Since, and a 304 Not Modified is answered from disk, so an unchanged page costs a
+round trip but not its body. Pages without validators are never stored. The store is a single SQLite file,
+trimmed least recently used first to max_bytes of page bodies.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import aiohttp
+from aiohttp.helpers import parse_mimetype
+from loguru import logger
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS page ('
+    'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, headers TEXT NOT NULL, '
+    'body BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+)
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPage:
+    url: str
+    etag: str | None
+    last_modified: str | None
+    headers: dict[str, str]
+    body: bytes
+
+
+@dataclass
+class CacheStats:
+    """Counts since the stats were last taken
+
+    A hit is a stored page confirmed by a 304, a miss a full download, stored the misses kept for next time.
+    """
+
+    requests: int = 0
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    bytes_saved: int = 0
+    bytes_downloaded: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+
+class HttpCache:
+    """Size-bounded store of pages and their validators
+
+    Methods block on disk, the session calls them in a worker thread.
+
+    Attributes:
+        path (Path): SQLite file holding the pages
+        max_bytes (int): Total body size kept, least recently used pages are evicted beyond it
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=wal')
+        self._conn.execute(SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CachedPage | None:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, etag, last_modified, headers, body FROM page WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        url, etag, last_modified, headers, body = row
+        return CachedPage(url, etag, last_modified, json.loads(headers), body)
+
+    def touch(self, url: str):
+        with self._lock:
+            self._conn.execute('UPDATE page SET accessed = ? WHERE url = ?', (time.time(), url))
+
+    def put(self, page: CachedPage):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO page VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    page.url,
+                    page.etag,
+                    page.last_modified,
+                    json.dumps(page.headers),
+                    page.body,
+                    len(page.body),
+                    time.time(),
+                ),
+            )
+            self._evict()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT coalesce(sum(size), 0) FROM page').fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute('SELECT coalesce(sum(size), 0) FROM page').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for url, size in self._conn.execute('SELECT url, size FROM page ORDER BY accessed').fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        self._conn.executemany('DELETE FROM page WHERE url = ?', evicted)
+        logger.debug(f'Evicted {len(evicted)} pages from the HTTP cache')
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedResponse:
+    """Stands in for the aiohttp.ClientResponse of a page served from the cache"""
+
+    status = 200
+    ok = True
+
+    def __init__(self, page: CachedPage):
+        self._page = page
+        self.url = URL(page.url)
+        self.headers = CIMultiDictProxy(CIMultiDict(page.headers))
+        mimetype = parse_mimetype(self.headers.get('Content-Type', 'application/octet-stream'))
+        self.content_type = f'{mimetype.type}/{mimetype.subtype}'
+        self.charset = mimetype.parameters.get('charset')
+
+    async def read(self) -> bytes:
+        return self._page.body
+
+    async def text(self, encoding: str | None = None, errors: str = 'strict') -> str:
+        return self._page.body.decode(encoding or self.charset or 'utf-8', errors)
+
+    async def json(self, *, loads=json.loads, **_):
+        return loads(await self.text())
+
+    def raise_for_status(self):
+        pass
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class _RequestContext:
+    """Awaitable and async context manager, like the object aiohttp.ClientSession.get returns"""
+
+    def __init__(self, coro):
+        self._coro = coro
+        self._response = None
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self):
+        self._response = await self._coro
+        return self._response
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._response.release()
+
+
+class CachingSession:
+    """ClientSession wrapper answering repeat GETs from an HttpCache after a conditional request
+
+    Anything other than get is passed through to the wrapped session.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, cache: HttpCache):
+        self.session = session
+        self.cache = cache
+        self.stats = CacheStats()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def get(self, url, **kwargs) -> _RequestContext:
+        return _RequestContext(self._get(url, **kwargs))
+
+    async def _get(self, url, **kwargs):
+        key = str(url)
+        page = await asyncio.to_thread(self.cache.get, key)
+        headers = CIMultiDict(kwargs.pop('headers', None) or {})
+        if page is not None:
+            if page.etag:
+                headers['If-None-Match'] = page.etag
+            if page.last_modified:
+                headers['If-Modified-Since'] = page.last_modified
+        response = await self.session.get(url, headers=headers, **kwargs)
+        self.stats.requests += 1
+
+        if page is not None and response.status == 304:
+            response.release()
+            self.stats.hits += 1
+            self.stats.bytes_saved += len(page.body)
+            await asyncio.to_thread(self.cache.touch, key)
+            return CachedResponse(page)
+
+        self.stats.misses += 1
+        if response.status != 200:
+            return response
+        body = await response.read()
+        self.stats.bytes_downloaded += len(body)
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if etag or last_modified:
+            stored_headers = {_: response.headers[_] for _ in STORED_HEADERS if _ in response.headers}
+            await asyncio.to_thread(self.cache.put, CachedPage(key, etag, last_modified, stored_headers, body))
+            self.stats.stored += 1
+        return response
+
+    def take_stats(self) -> CacheStats:
+        """Stats since the last call"""
+        stats, self.stats = self.stats, CacheStats()
+        return stats
+
+    async def close(self):
+        await self.session.close()
+        self.cache.close()
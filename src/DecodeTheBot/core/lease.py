@@ -0,0 +1,97 @@
+import asyncio
+import os
+import socket
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import OperationalError
+
+from DecodeTheBot.models.meta import WorkerLease, utcnow
+
+
+class LeaseHeld(Exception):
+    """Another live process holds the writer lease"""
+
+
+class LeaseLost(Exception):
+    """The writer lease expired and was taken over while we held it"""
+
+
+class WriterLease:
+    """Lease row guaranteeing a single writer across processes sharing the database
+
+    Attributes:
+        engine: Writable engine on the database
+        ttl (int): Seconds without a heartbeat after which the lease may be taken over
+        holder (str): Identifies this process in the lease row
+    """
+
+    def __init__(self, engine, ttl: int = 60, holder: str | None = None):
+        self.engine = engine
+        self.ttl = ttl
+        self.holder = holder or f'{socket.gethostname()}:{os.getpid()}'
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free, stale or already ours"""
+        WorkerLease.__table__.create(self.engine, checkfirst=True)
+        now = utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(insert(WorkerLease).prefix_with('OR IGNORE').values(id=1, holder='', heartbeat=now))
+            result = conn.execute(
+                update(WorkerLease)
+                .where(
+                    WorkerLease.id == 1,
+                    or_(
+                        WorkerLease.holder.in_((self.holder, '')),
+                        WorkerLease.heartbeat < now - timedelta(seconds=self.ttl),
+                    ),
+                )
+                .values(holder=self.holder, acquired=now, heartbeat=now)
+            )
+        return result.rowcount == 1
+
+    def renew(self) -> bool:
+        """Refresh the heartbeat, False if the lease is no longer ours"""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(WorkerLease)
+                .where(WorkerLease.id == 1, WorkerLease.holder == self.holder)
+                .values(heartbeat=utcnow())
+            )
+        return result.rowcount == 1
+
+    def release(self):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(WorkerLease).where(WorkerLease.id == 1, WorkerLease.holder == self.holder).values(holder='')
+            )
+
+    def current_holder(self) -> str:
+        with self.engine.connect() as conn:
+            return conn.execute(select(WorkerLease.holder).where(WorkerLease.id == 1)).scalar() or ''
+
+    async def keep(self):
+        """Renew the lease every third of its ttl until cancelled, raising LeaseLost if it is taken over
+
+        Renewals run on their own thread and connection, not the writer thread, so a long write queued there
+        can't hold up the heartbeat until the lease goes stale.
+        A renewal failing on a busy database is retried at the next interval, the lease is only given up once
+        the ttl has passed since the last heartbeat, when another process may take it over.
+        """
+        loop = asyncio.get_running_loop()
+        stale_at = loop.time() + self.ttl
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                renewed = await asyncio.to_thread(self.renew)
+            except OperationalError as e:
+                if loop.time() >= stale_at:
+                    logger.error(f'Writer lease of {self.holder} not renewed within its ttl: {e}')
+                    raise LeaseLost(self.holder) from e
+                logger.warning(f'Writer lease renewal failed, retrying: {e}')
+                continue
+            if not renewed:
+                logger.error(f'Writer lease lost by {self.holder} to {await asyncio.to_thread(self.current_holder)}')
+                raise LeaseLost(self.holder)
+            stale_at = loop.time() + self.ttl
@@ -0,0 +1,162 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+import sqlmodel as sqm
+from loguru import logger
+from suppawt import get_values
+
+# ends each value in the text of all values, sorts before any character so a value sorts before its extensions
+SEP = '\x00'
+# suffixes per block of the sorted suffix list, a block is split in two when it doubles
+BLOCK = 512
+# suffixes sorted at once when building in bulk, the sorted runs are then merged
+RUN = 65_536
+
+
+class Matcher:
+    """Find rows of a model whose title or name overlaps a given string
+
+    A match is either direction of a case-insensitive substring check, as in 'guru name in episode title'
+    or 'episode title in thread title'.
+    Values are lowercased and kept once each, with the ids of the rows holding them. Row values contained in the
+    text are found by walking each suffix of the text through the sorted values, a bisect per character, stopping
+    as soon as no value starts with what has been read.
+    Texts contained in row values are found by binary search in the sorted suffixes of every value, stored as
+    positions in one string of all values, then reading along the suffixes starting with the text.
+    Lookups cost in the length of the text and the number of matches, and only logarithmically in the number
+    of rows. Suffixes are 4-byte positions in arrays, kept sorted in blocks so adding a row moves nothing else.
+
+    Attributes:
+        model (type): Model whose rows are matched
+        attr (str): Name of the title or name attribute on model
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.attr = get_values.title_or_name_var(model)
+        self._ids: dict[str, tuple[int, ...]] = {}
+        self._sorted: list[str] = []
+        self._text = ''
+        self._starts = array('I')
+        self._values: list[str] = []
+        self._blocks: list[array] = []
+        self._maxes: list[int] = []
+
+    def __len__(self) -> int:
+        return sum(len(_) for _ in self._ids.values())
+
+    @classmethod
+    def from_session(cls, session: sqm.Session, model) -> 'Matcher':
+        """Build a matcher from the id and title or name of every row of model in the database"""
+        matcher = cls(model)
+        matcher.extend(session.exec(sqm.select(model.id, getattr(model, matcher.attr))))
+        logger.debug(f'Built {model.__name__} matcher from {len(matcher)} rows')
+        return matcher
+
+    def add_obj(self, obj):
+        self.add(obj.id, getattr(obj, self.attr))
+
+    def add(self, id_: int, value: str):
+        """Add a row to the matcher"""
+        if (value := self._store_id(id_, value)) is not None:
+            insort(self._sorted, value)
+            for pos in self._append(value):
+                self._insert(pos)
+
+    def extend(self, rows):
+        """Add (id, value) rows in bulk, sorting suffixes in runs and merging them rather than inserting each"""
+        new = [value for id_, value_ in rows if (value := self._store_id(id_, value_)) is not None]
+        if not new:
+            return
+        self._sorted = sorted(self._sorted + new)
+        start = len(self._text)
+        self._text += ''.join(f'{_}{SEP}' for _ in new)
+        for value in new:
+            self._starts.append(start)
+            self._values.append(value)
+            start += len(value) + 1
+
+        positions = array('I', (pos for block in self._blocks for pos in block))
+        positions.extend(pos for pos in range(self._starts[-len(new)], len(self._text)) if self._text[pos] != SEP)
+        runs = [array('I', sorted(positions[i : i + RUN], key=self._suffix)) for i in range(0, len(positions), RUN)]
+        del positions
+        self._blocks, block = [], array('I')
+        for pos in heapq.merge(*runs, key=self._suffix):
+            block.append(pos)
+            if len(block) == BLOCK:
+                self._blocks.append(block)
+                block = array('I')
+        if block:
+            self._blocks.append(block)
+        self._maxes = [_[-1] for _ in self._blocks]
+
+    def matches(self, text: str) -> set[int]:
+        """Ids of rows whose value is in text or contains text"""
+        text = text.lower().replace(SEP, '')
+        if not text:
+            return set()
+        return {id_ for value in self._contained_in(text) | self._containing(text) for id_ in self._ids[value]}
+
+    def _store_id(self, id_: int, value: str) -> str | None:
+        """Record id_ against value, returning the lowercased value if it is new to the matcher"""
+        value = value.lower().replace(SEP, '')
+        if not value:
+            return None
+        ids = self._ids.get(value)
+        self._ids[value] = (*ids, id_) if ids else (id_,)
+        return None if ids else value
+
+    def _append(self, value: str) -> range:
+        """Add value to the text of all values, returning the positions of its suffixes"""
+        start = len(self._text)
+        self._text += f'{value}{SEP}'
+        self._starts.append(start)
+        self._values.append(value)
+        return range(start, start + len(value))
+
+    def _suffix(self, pos: int) -> str:
+        return self._text[pos : self._text.index(SEP, pos)]
+
+    def _insert(self, pos: int):
+        if not self._blocks:
+            self._blocks.append(array('I', [pos]))
+            self._maxes.append(pos)
+            return
+        i = min(bisect_left(self._maxes, self._suffix(pos), key=self._suffix), len(self._blocks) - 1)
+        block = self._blocks[i]
+        insort(block, pos, key=self._suffix)
+        self._maxes[i] = block[-1]
+        if len(block) > 2 * BLOCK:
+            self._blocks[i : i + 1] = block[:BLOCK], block[BLOCK:]
+            self._maxes[i : i + 1] = block[BLOCK - 1], block[-1]
+
+    def _contained_in(self, text: str) -> set[str]:
+        found = set()
+        values = self._sorted
+        for start in range(len(text)):
+            lo = 0
+            for end in range(start + 1, len(text) + 1):
+                prefix = text[start:end]
+                lo = bisect_left(values, prefix, lo)
+                if lo == len(values) or not values[lo].startswith(prefix):
+                    break
+                if values[lo] == prefix:
+                    found.add(prefix)
+        return found
+
+    def _containing(self, text: str) -> set[str]:
+        found = set()
+        corpus, size = self._text, len(text)
+
+        def head(pos: int) -> str:
+            # a text holds no separator, so reading past the end of a value can't make it match
+            return corpus[pos : pos + size]
+
+        for i in range(bisect_left(self._maxes, text, key=head), len(self._blocks)):
+            block = self._blocks[i]
+            for pos in block[bisect_left(block, text, key=head) :]:
+                if head(pos) != text:
+                    return found
+                found.add(self._values[bisect_right(self._starts, pos) - 1])
+        return found
@@ -0,0 +1,92 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass
+class QueueStats:
+    """Snapshot of a MonitoredQueue
+
+    Rates are items per second over the last rate_window seconds, waits are seconds an item spent queued.
+    """
+
+    name: str
+    maxsize: int
+    depth: int
+    high_water: int
+    enqueued: int
+    dequeued: int
+    enqueue_rate: float
+    dequeue_rate: float
+    wait_p50: float
+    wait_p95: float
+    wait_max: float
+
+
+class MonitoredQueue(asyncio.Queue):
+    """asyncio.Queue recording depth, throughput and time-in-queue
+
+    A maxsize > 0 makes put() block when full, so producers are held back rather than buffering without limit.
+
+    Attributes:
+        name (str): Name used in stats and logs
+        rate_window (float): Seconds of history used for enqueue/dequeue rates
+    """
+
+    def __init__(self, maxsize: int = 0, name: str = 'queue', rate_window: float = 60, wait_samples: int = 1000):
+        super().__init__(maxsize)
+        self.name = name
+        self.rate_window = rate_window
+        self.high_water = 0
+        self.enqueued = 0
+        self.dequeued = 0
+        self._put_times: deque[float] = deque()
+        self._get_times: deque[float] = deque()
+        self._waits: deque[float] = deque(maxlen=wait_samples)
+
+    # put() and get() finish through put_nowait() and get_nowait(), so every item is timed here
+    def put_nowait(self, item):
+        now = time.monotonic()
+        super().put_nowait((now, item))
+        self.enqueued += 1
+        self._record(self._put_times, now)
+        self.high_water = max(self.high_water, self.qsize())
+
+    def get_nowait(self):
+        enqueued_at, item = super().get_nowait()
+        now = time.monotonic()
+        self.dequeued += 1
+        self._record(self._get_times, now)
+        self._waits.append(now - enqueued_at)
+        return item
+
+    def _record(self, times: deque[float], now: float):
+        times.append(now)
+        self._prune(times, now)
+
+    def _prune(self, times: deque[float], now: float):
+        cutoff = now - self.rate_window
+        while times and times[0] < cutoff:
+            times.popleft()
+
+    def _rate(self, times: deque[float]) -> float:
+        self._prune(times, time.monotonic())
+        return len(times) / self.rate_window
+
+    def stats(self) -> QueueStats:
+        waits = sorted(self._waits)
+        return QueueStats(
+            name=self.name,
+            maxsize=self.maxsize,
+            depth=self.qsize(),
+            high_water=self.high_water,
+            enqueued=self.enqueued,
+            dequeued=self.dequeued,
+            enqueue_rate=self._rate(self._put_times),
+            dequeue_rate=self._rate(self._get_times),
+            wait_p50=statistics.median(waits) if waits else 0.0,
+            wait_p95=waits[int(len(waits) * 0.95)] if waits else 0.0,
+            wait_max=waits[-1] if waits else 0.0,
+        )
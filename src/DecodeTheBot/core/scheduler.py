@@ -0,0 +1,135 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from loguru import logger
+
+# rate limit as (requests remaining, seconds until the limit resets), either None if unknown
+RateLimit = tuple[float | None, float | None]
+# failed polls double the backoff at most this many times, past it the float would overflow, long after max_backoff
+MAX_DOUBLINGS = 16
+
+
+@dataclass
+class PollStats:
+    """Snapshot of a PollScheduler
+
+    Latencies are seconds per fetch over the last latency_samples polls, successful or not.
+    """
+
+    name: str
+    interval: float
+    polls: int
+    errors: int
+    consecutive_errors: int
+    new_items: int
+    latency_p50: float
+    latency_p95: float
+    latency_max: float
+
+
+class PollScheduler:
+    """Poll interval that follows how often a source actually changes
+
+    The interval halves after a poll that finds new items and grows by a quarter after one that finds none,
+    within [min_interval, max_interval]. Failed polls back off exponentially from the current interval up to
+    max_backoff, with full jitter. A nearly spent rate limit holds the next poll until the limit resets.
+
+    Attributes:
+        name (str): Name used in stats and logs
+        interval (float): Current interval between successful polls
+        min_remaining (float): Requests left at or below which we wait for the rate limit to reset
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        min_interval: float,
+        max_interval: float,
+        max_backoff: float | None = None,
+        min_remaining: float = 10,
+        jitter: float = 0.1,
+        latency_samples: int = 100,
+    ):
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.max_backoff = max_backoff or max_interval
+        self.min_remaining = min_remaining
+        self.jitter = jitter
+        self.polls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.new_items = 0
+        self._latencies: deque[float] = deque(maxlen=latency_samples)
+
+    def record(self, new_items: int, latency: float):
+        """Adapt the interval to the outcome of a successful poll"""
+        self.polls += 1
+        self.new_items += new_items
+        self.consecutive_errors = 0
+        self._latencies.append(latency)
+        factor = 0.5 if new_items else 1.25
+        self.interval = min(max(self.interval * factor, self.min_interval), self.max_interval)
+
+    def record_error(self, latency: float):
+        self.polls += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+        self._latencies.append(latency)
+
+    def next_delay(self, rate_limit: RateLimit = (None, None)) -> float:
+        """Seconds to wait before the next poll"""
+        if self.consecutive_errors:
+            ceiling = min(self.interval * 2 ** min(self.consecutive_errors, MAX_DOUBLINGS), self.max_backoff)
+            delay = random.uniform(self.min_interval, max(ceiling, self.min_interval))
+        else:
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        remaining, reset_in = rate_limit
+        if remaining is not None and reset_in is not None and remaining <= self.min_remaining:
+            delay = max(delay, reset_in)
+        return delay
+
+    async def run(
+        self,
+        poll: Callable[[], Awaitable[int]],
+        rate_limit: Callable[[], RateLimit] | None = None,
+        log_category: str = 'General',
+    ):
+        """Call poll, which returns the number of new items it found, forever at the adapted interval"""
+        while True:
+            start = time.perf_counter()
+            try:
+                new_items = await poll()
+            # any failure of a poll, the network, the source or the database, is retried after a backoff
+            except Exception as e:  # noqa: BLE001
+                self.record_error(time.perf_counter() - start)
+                logger.exception(
+                    f'{self.name} poll failed, {self.consecutive_errors} in a row: {type(e).__name__}: {e}',
+                    category=log_category,
+                )
+            else:
+                self.record(new_items, time.perf_counter() - start)
+            delay = self.next_delay(rate_limit() if rate_limit else (None, None))
+            logger.debug(f'{self.stats()}, next poll in {delay:.0f}s', category=log_category)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> PollStats:
+        latencies = sorted(self._latencies)
+        return PollStats(
+            name=self.name,
+            interval=self.interval,
+            polls=self.polls,
+            errors=self.errors,
+            consecutive_errors=self.consecutive_errors,
+            new_items=self.new_items,
+            latency_p50=statistics.median(latencies) if latencies else 0.0,
+            latency_p95=latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            latency_max=latencies[-1] if latencies else 0.0,
+        )
@@ -0,0 +1,129 @@
+"""Full-text search over episodes, gurus and reddit threads with an SQLite FTS5 table
+
+Each row of search_fts is a document for one episode, guru or thread. Its rowid encodes both:
+rowid = id * STRIDE + KINDS[model], so documents are replaced and results decoded without lookups.
+"""
+
+import re
+from collections.abc import Iterable, Sequence
+
+import sqlmodel as sqm
+from sqlalchemy import text
+
+from DecodeTheBot.models import episode_m, guru_m, reddit_m
+
+FTS_TABLE = 'search_fts'
+KINDS = {
+    episode_m.Episode: 1,
+    guru_m.Guru: 2,
+    reddit_m.RedditThread: 3,
+}
+STRIDE = 4
+COLUMNS = ('title', 'notes', 'gurus')
+
+CREATE_FTS = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    {', '.join(COLUMNS)}, prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+# each select yields (rowid, title, notes, gurus) for the rows of one model, restricted by a WHERE clause
+DOC_SELECTS = {
+    episode_m.Episode: f"""
+        SELECT e.id * {STRIDE} + {KINDS[episode_m.Episode]}, e.title,
+            (SELECT group_concat(value, ' ') FROM json_each(e.notes)),
+            (SELECT group_concat(g.name, ' ') FROM guruepisodelink l JOIN guru g ON g.id = l.guru_id
+                WHERE l.episode_id = e.id)
+        FROM episode e
+    """,
+    guru_m.Guru: f"""
+        SELECT g.id * {STRIDE} + {KINDS[guru_m.Guru]}, g.name, NULL, NULL
+        FROM guru g
+    """,
+    reddit_m.RedditThread: f"""
+        SELECT r.id * {STRIDE} + {KINDS[reddit_m.RedditThread]}, r.title, NULL,
+            (SELECT group_concat(g.name, ' ') FROM redditthreadgurulink l JOIN guru g ON g.id = l.guru_id
+                WHERE l.reddit_thread_id = r.id)
+        FROM redditthread r
+    """,
+}
+ALIASES = {episode_m.Episode: 'e', guru_m.Guru: 'g', reddit_m.RedditThread: 'r'}
+
+
+def create_fts(engine):
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_FTS))
+
+
+def index_rows(session: sqm.Session, model, ids: Iterable[int]):
+    """Add or replace the search documents for rows of model"""
+    if not (ids := sorted(ids)):
+        return
+    id_list = ', '.join(str(int(_)) for _ in ids)
+    rowids = ', '.join(str(_ * STRIDE + KINDS[model]) for _ in ids)
+    session.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({rowids})'))
+    session.execute(
+        text(
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(COLUMNS)}) '
+            f'{DOC_SELECTS[model]} WHERE {ALIASES[model]}.id IN ({id_list})'
+        )
+    )
+
+
+def rebuild(session: sqm.Session):
+    """Rebuild every search document from the database"""
+    session.execute(text(f'DELETE FROM {FTS_TABLE}'))
+    for select_docs in DOC_SELECTS.values():
+        session.execute(text(f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(COLUMNS)}) {select_docs}'))
+
+
+def in_sync(session: sqm.Session) -> bool:
+    """True if there is one search document per episode, guru and thread"""
+    docs = session.execute(text(f'SELECT count(*) FROM {FTS_TABLE}')).scalar()
+    rows = sum(session.execute(text(f'SELECT count(*) FROM {model.__tablename__}')).scalar() for model in KINDS)
+    return docs == rows
+
+
+def match_expression(search_str: str, column: str | None = None) -> str | None:
+    """FTS5 query matching every word of search_str as a prefix, optionally within one column"""
+    if not (words := re.findall(r'\w+', search_str.lower())):
+        return None
+    terms = ' '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({terms})' if column else terms
+
+
+def search(
+    session: sqm.Session, model, search_str: str, column: str | None = None, limit: int | None = None
+) -> list[int]:
+    """Ids of rows of model matching search_str, best match first"""
+    if (expression := match_expression(search_str, column)) is None:
+        return []
+    result = session.execute(
+        text(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression AND rowid % {STRIDE} = :kind '
+            f'ORDER BY rank LIMIT :limit'
+        ),
+        {'expression': expression, 'kind': KINDS[model], 'limit': -1 if limit is None else limit},
+    )
+    return [rowid // STRIDE for rowid in result.scalars()]
+
+
+def linked_ids(session: sqm.Session, link_model, from_field: str, to_field: str, ids: Sequence[int]) -> list[int]:
+    """Ids linked to ids through link_model, in the order of the first linked id"""
+    if not ids:
+        return []
+    rank = {id_: i for i, id_ in enumerate(ids)}
+    from_col, to_col = getattr(link_model, from_field), getattr(link_model, to_field)
+    rows = session.exec(sqm.select(from_col, to_col).where(from_col.in_(ids))).all()
+    best: dict[int, int] = {}
+    for from_id, to_id in rows:
+        best[to_id] = min(best.get(to_id, len(rank)), rank[from_id])
+    return sorted(best, key=best.get)
+
+
+def fetch_ranked(session: sqm.Session, model, ids: Sequence[int], options: Sequence = ()) -> list:
+    """Rows of model for ids, in the order of ids, with loader options applied"""
+    if not ids:
+        return []
+    rows = {_.id: _ for _ in session.exec(sqm.select(model).where(model.id.in_(ids)).options(*options)).all()}
+    return [rows[_] for _ in ids if _ in rows]
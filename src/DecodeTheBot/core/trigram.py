@@ -0,0 +1,120 @@
+"""In-memory trigram index for typo tolerant search-as-you-type
+
+Strings are lowercased, reduced to words and padded, then split into overlapping three character grams.
+A query is answered from the posting lists of its rarest grams, so common grams never cost a full scan,
+and the surviving candidates are ranked by the share of grams they have in common with the query.
+Removed strings are skipped by queries until they outnumber the live ones, then the posting lists are rebuilt.
+"""
+
+import heapq
+import re
+import threading
+from collections import Counter
+from collections.abc import Hashable
+from dataclasses import dataclass
+
+WORD = re.compile(r'\w+')
+
+
+def normalise(text: str) -> str:
+    return ' '.join(WORD.findall(text.lower()))
+
+
+def trigrams(text: str) -> set[str]:
+    """Grams of normalised text, padded so word starts and short strings still produce grams"""
+    padded = f'  {text} '
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True, slots=True)
+class Hit:
+    key: Hashable
+    text: str
+    score: float
+
+
+class TrigramIndex:
+    """Trigram posting lists over short strings, eg titles and names
+
+    Attributes:
+        scan_budget (int): Maximum posting entries counted per query, rarest grams first
+        shortlist (int): Candidates per requested hit that are rescored exactly
+    """
+
+    def __init__(self, scan_budget: int = 10_000, shortlist: int = 6):
+        self.scan_budget = scan_budget
+        self.shortlist = shortlist
+        self._keys: list[Hashable] = []
+        self._texts: list[str] = []
+        self._normalised: list[str] = []
+        self._postings: dict[str, list[int]] = {}
+        self._docs: dict[Hashable, int] = {}
+        self._removed: set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, key: Hashable, text: str):
+        with self._lock:
+            doc = len(self._keys)
+            self._keys.append(key)
+            self._texts.append(text)
+            self._normalised.append(normalised := normalise(text))
+            self._docs[key] = doc
+            for gram in trigrams(normalised):
+                self._postings.setdefault(gram, []).append(doc)
+
+    def remove(self, key: Hashable):
+        """Stop returning the string added under key"""
+        with self._lock:
+            self._removed.add(self._docs.pop(key))
+            if len(self._removed) > len(self._docs):
+                self._compact()
+
+    def _compact(self):
+        """Rebuild the index from the live strings, dropping removed ones from the posting lists"""
+        live = sorted(self._docs.values())
+        self._keys = [self._keys[_] for _ in live]
+        self._texts = [self._texts[_] for _ in live]
+        self._normalised = [self._normalised[_] for _ in live]
+        self._docs = {key: doc for doc, key in enumerate(self._keys)}
+        self._removed = set()
+        self._postings = {}
+        for doc, normalised in enumerate(self._normalised):
+            for gram in trigrams(normalised):
+                self._postings.setdefault(gram, []).append(doc)
+
+    def search(self, query: str, k: int = 10) -> list[Hit]:
+        """The k strings most similar to query, best first
+
+        Similarity is the Jaccard index of the two gram sets, plus one if the string contains the query outright,
+        so completions of what has been typed so far rank above near misses.
+        """
+        if not (query := normalise(query)):
+            return []
+        query_grams = trigrams(query)
+        # add appends to the posting lists and remove may rebuild them, so read them under the lock
+        with self._lock:
+            lists = sorted((self._postings.get(_, ()) for _ in query_grams), key=len)
+            counts = Counter()
+            scanned = 0
+            for posting in lists:
+                if scanned and scanned + len(posting) > self.scan_budget:
+                    break
+                counts.update(posting)
+                scanned += len(posting)
+            for doc in self._removed & counts.keys():
+                del counts[doc]
+            shortlist = [
+                (self._keys[doc], self._texts[doc], self._normalised[doc])
+                for doc, _ in counts.most_common(k * self.shortlist)
+            ]
+
+        scored = []
+        for key, text, normalised in shortlist:
+            doc_grams = trigrams(normalised)
+            shared = len(query_grams & doc_grams)
+            score = shared / (len(query_grams) + len(doc_grams) - shared) + (query in normalised)
+            scored.append(Hit(key, text, score))
+        return heapq.nlargest(k, scored, key=lambda hit: hit.score)
@@ -0,0 +1,93 @@
+"""High-water marks for the podcast feed and the subreddit
+
+Both sources list newest first. The bot queues what it finds oldest first, so items commit in publication order
+and the mark, advanced in the same transaction, never passes an item that has not been committed. Items a batch
+fails to store stay in the durable queue and are retried on the next start, so the mark passing them loses nothing.
+"""
+
+import datetime as dt
+
+import sqlmodel as sqm
+from sqlalchemy.dialects.sqlite import insert
+
+from DecodeTheBot.models import episode_m, reddit_m
+from DecodeTheBot.models.meta import Watermark, utcnow
+
+SOURCES = {episode_m.Episode: 'episode', reddit_m.RedditThread: 'reddit'}
+
+
+def naive_utc(value: dt.datetime | dt.date) -> dt.datetime:
+    if not isinstance(value, dt.datetime):
+        return dt.datetime.combine(value, dt.time())
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.UTC).replace(tzinfo=None)
+    return value
+
+
+def position(item) -> dt.datetime:
+    if isinstance(item, episode_m.Episode):
+        return naive_utc(item.date)
+    return naive_utc(item.created_datetime)
+
+
+def key(item) -> str:
+    if isinstance(item, episode_m.Episode):
+        return item.get_hash
+    return item.reddit_id
+
+
+def load(session: sqm.Session) -> dict[type, Watermark]:
+    """Marks per model, detached from the session, seeded from the newest stored row for older databases"""
+    for model, source in SOURCES.items():
+        if session.get(Watermark, source) is not None:
+            continue
+        if (newest := session.exec(sqm.select(model).order_by(*newest_first(model)).limit(1)).first()) is not None:
+            session.add(Watermark(source=source, position=position(newest), key=key(newest)))
+    session.commit()
+    marks = {}
+    for model, source in SOURCES.items():
+        if (mark := session.get(Watermark, source)) is not None:
+            session.expunge(mark)
+            marks[model] = mark
+    return marks
+
+
+def newest_first(model) -> tuple:
+    if model is episode_m.Episode:
+        return model.date.desc(), model.id.desc()
+    return model.created_datetime.desc(), model.id.desc()
+
+
+def newest(model, items: list) -> Watermark | None:
+    """Mark at the newest of items, not stored"""
+    if model not in SOURCES or not items:
+        return None
+    item = max(items, key=position)
+    return Watermark(source=SOURCES[model], position=position(item), key=key(item), updated=utcnow())
+
+
+def advance(session: sqm.Session, model, items: list) -> Watermark | None:
+    """Move the mark for model up to the newest of items, in the caller's transaction
+
+    Returns:
+        Watermark: The new mark, or None if items are no newer than the stored one
+    """
+    if (mark := newest(model, items)) is None:
+        return None
+    values = mark.model_dump()
+    statement = insert(Watermark).values(values)
+    result = session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Watermark.source],
+            set_={_: statement.excluded[_] for _ in ('position', 'key', 'updated')},
+            where=statement.excluded.position >= Watermark.position,
+        )
+    )
+    return mark if result.rowcount else None
+
+
+def passed(mark: Watermark | None, item_key: str, item_position: dt.datetime) -> bool:
+    """True once a newest-first walk reaches the marked item or anything older"""
+    if mark is None:
+        return False
+    return item_key == mark.key or naive_utc(item_position) < mark.position
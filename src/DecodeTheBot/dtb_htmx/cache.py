@@ -0,0 +1,97 @@
+import functools
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+import sqlmodel
+from fastapi import Request
+from fastapi.responses import HTMLResponse
+from fastapi.templating import Jinja2Templates
+
+from DecodeTheBot.core.database import run_db
+from DecodeTheBot.dtb_htmx.conditional import current_version
+from DecodeTheBot.guru_config import guru_settings
+
+
+class FragmentCache:
+    """LRU cache of rendered html, bounded by total size in bytes
+
+    Keys end with the data version they were rendered at. Entries from older versions can never be hit again,
+    so they are dropped as soon as a newer version is stored.
+
+    Attributes:
+        max_bytes (int): Maximum total size of cached bodies
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.version = -1
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> bytes | None:
+        if (body := self._entries.get(key)) is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: tuple, body: bytes):
+        version = key[-1]
+        if version < self.version or len(body) > self.max_bytes:
+            return
+        if version > self.version:
+            self.clear()
+            self.version = version
+        if (old := self._entries.pop(key, None)) is not None:
+            self.size -= len(old)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+@functools.lru_cache
+def fragment_cache() -> FragmentCache:
+    return FragmentCache(guru_settings().fragment_cache_bytes)
+
+
+def render(templates: Jinja2Templates, request: Request, name: str, load_context: Callable[[], dict]) -> bytes:
+    context = load_context()
+    context.setdefault('request', request)
+    return templates.get_template(name).render(context).encode()
+
+
+async def render_cached(
+    templates: Jinja2Templates,
+    request: Request,
+    session: sqlmodel.Session,
+    name: str,
+    load_context: Callable[[], dict] = dict,
+) -> HTMLResponse:
+    """Render a template, reusing the cached html while the data version is unchanged
+
+    Args:
+        templates (Jinja2Templates): Templates to render from
+        request (Request): Current request, its url and query params are part of the cache key
+        session (sqlmodel.Session): Session for the data version and load_context
+        name (str): Template name
+        load_context (Callable): Blocking function returning the template context, only called on a miss
+    """
+    cache = fragment_cache()
+    version = (await current_version(request, session)).data_version
+    key = (name, str(request.url), version)
+    if (body := cache.get(key)) is None:
+        body = await run_db(render, templates, request, name, load_context)
+        cache.put(key, body)
+    return HTMLResponse(body)
@@ -0,0 +1,92 @@
+import functools
+import hashlib
+from datetime import UTC
+from email.utils import format_datetime
+from importlib import metadata
+
+import fastapi
+import sqlmodel
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+from DecodeTheBot.core import database
+from DecodeTheBot.core.database import get_session, run_db
+from DecodeTheBot.dtb_htmx import templating
+from DecodeTheBot.models.meta import DBMeta
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+async def current_version(request: Request, session: sqlmodel.Session) -> DBMeta:
+    """The data version, read once per request"""
+    if (meta := getattr(request.state, 'data_version', None)) is None:
+        meta = await run_db(database.data_version, session)
+        request.state.data_version = meta
+    return meta
+
+
+@functools.lru_cache
+def build_token() -> str:
+    """Short hash of the package version and every template, so markup changed by a deploy gets a new ETag"""
+    try:
+        version = metadata.version('DecodeTheBot')
+    except metadata.PackageNotFoundError:
+        version = 'unknown'
+    digest = hashlib.sha256(version.encode())
+    for path in sorted(templating.TEMPLATE_DIR.rglob('*')):
+        if path.is_file():
+            digest.update(path.relative_to(templating.TEMPLATE_DIR).as_posix().encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def validators(meta: DBMeta) -> dict[str, str]:
+    """ETag and Last-Modified headers for the data version
+
+    The ETag also carries the build token, as the same data renders differently after a deploy.
+    Last-Modified is informational, HTTP dates only resolve to the second so it can't tell apart two commits
+    within one. Conditional requests are answered from the ETag alone.
+    """
+    return {
+        'ETag': f'"v{meta.data_version}-{build_token()}"',
+        'Last-Modified': format_datetime(meta.updated.replace(tzinfo=UTC), usegmt=True),
+        'Cache-Control': 'no-cache',
+    }
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether the client's cached copy is current, per If-None-Match"""
+    if if_none_match := request.headers.get('if-none-match'):
+        tags = {_.strip().removeprefix('W/') for _ in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+    return False
+
+
+async def check_not_modified(request: Request, session: sqlmodel.Session = fastapi.Depends(get_session)):
+    """Answer conditional GETs with 304 before the route queries or renders anything"""
+    if request.method not in SAFE_METHODS:
+        return
+    meta = await current_version(request, session)
+    headers = validators(meta)
+    if not_modified(request, headers['ETag']):
+        raise HTTPException(status_code=304, headers=headers)
+
+
+class ConditionalRoute(APIRoute):
+    """Route adding ETag and Last-Modified to successful GET responses
+
+    Use with check_not_modified as a router dependency, which reads the data version for the request.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def conditional_handler(request: Request) -> Response:
+            response = await handler(request)
+            meta = getattr(request.state, 'data_version', None)
+            if meta is not None and request.method in SAFE_METHODS and response.status_code == 200:
+                for header, value in validators(meta).items():
+                    response.headers.setdefault(header, value)
+            return response
+
+        return conditional_handler
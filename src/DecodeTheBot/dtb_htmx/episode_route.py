@@ -1,25 +1,37 @@
+import datetime as dt
 import typing as _t
-from pathlib import Path
 
 import fastapi
+import sqlalchemy as sqa
 import sqlmodel
 from fastapi import Form, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import select
+from sqlalchemy.orm import selectinload
 from suppawt.pawlogger.config_loguru import logger
 
-from DecodeTheBot.core.database import get_session
+from DecodeTheBot.core import search
+from DecodeTheBot.core.database import get_session, run_db
+from DecodeTheBot.dtb_htmx.cache import render_cached
+from DecodeTheBot.dtb_htmx.conditional import ConditionalRoute, check_not_modified
+from DecodeTheBot.dtb_htmx.paging import next_page
+from DecodeTheBot.dtb_htmx.streaming import stream_template
+from DecodeTheBot.dtb_htmx.templating import templates
+from DecodeTheBot.guru_config import guru_settings
 from DecodeTheBot.models import episode_m, guru_m, reddit_m  # noqa F401
 
 SearchKind = _t.Literal['title', 'guru', 'notes']
 # app = FastAPI()
-router = fastapi.APIRouter()
+router = fastapi.APIRouter(route_class=ConditionalRoute, dependencies=[fastapi.Depends(check_not_modified)])
 # app.mount('/static', StaticFiles(directory='static'), name='static')
-THIS_DIR = Path(__file__).resolve().parent
-template_dir = THIS_DIR.parent / 'ui/templates'
-print('TEMPLATE DIR', template_dir)
-templates = Jinja2Templates(directory=str(template_dir))
+
+# rows fetched per round trip while streaming the archive
+ARCHIVE_BATCH = 500
+
+# relations each view renders, loaded up front in one query per relation; cards render no relations
+DETAIL_LOADS = (
+    selectinload(episode_m.Episode.gurus),
+    selectinload(episode_m.Episode.reddit_threads).options(*reddit_m.payload_defers()),
+)
 
 
 # @app.get("/get_all/", response_class=HTMLResponse)
@@ -30,44 +42,49 @@ templates = Jinja2Templates(directory=str(template_dir))
 #     )
 
 
-def episode_matches(episodes, search_str, search_kind: SearchKind = 'title'):
-    match search_kind:
-        case 'title':
-            matched_ = [ep for ep in episodes if search_str.lower() in ep.title.lower()]
-        case 'guru':
-            matched_ = [ep for ep in episodes if any(search_str.lower() in guru.name.lower() for guru in ep.gurus)]
-        case 'notes':
-            matched_ = [ep for ep in episodes for note in ep.notes if search_str.lower() in note.lower()]
-        case _:
-            raise ValueError(f'Invalid kind: {search_kind}')
-    return sorted(matched_, key=lambda ep: ep.date, reverse=True)
-
-
-def episode_matches2(session, search_str, search_kind: SearchKind = 'title'):
-    match search_kind:
-        case 'title':
-            statement = select(episode_m.Episode).where(search_str.lower() in episode_m.Episode.title.lower())
-        case 'guru':
-            statement = select(episode_m.Episode).where(
-                search_str.lower() in any([_.name for _ in episode_m.Episode.gurus])
-            )
-        case 'notes':
-            statement = select(episode_m.Episode).where(search_str.lower() in any([_ for _ in episode_m.Episode.notes]))
-        case _:
-            raise ValueError(f'Invalid kind: {search_kind}')
-
-    matched_ = session.exec(statement).all()
-    return sorted(matched_, key=lambda ep: ep.date, reverse=True)
+SEARCH_COLUMNS: dict[SearchKind, str] = {'title': 'title', 'guru': 'gurus', 'notes': 'notes'}
 
 
-@router.get('/get_eps/', response_class=HTMLResponse)
-async def get_ep_cards(request: Request, session: sqlmodel.Session = fastapi.Depends(get_session)):
-    episodes = await from_sesh(episode_m.Episode, session)
-    episodes = sorted(episodes, key=lambda ep: ep.date, reverse=True)
+def episode_matches(session: sqlmodel.Session, search_str: str, search_kind: SearchKind = 'title'):
+    """Episodes matching search_str in the search index, best match first"""
+    if search_kind not in SEARCH_COLUMNS:
+        raise ValueError(f'Invalid kind: {search_kind}')
+    ids = search.search(session, episode_m.Episode, search_str, column=SEARCH_COLUMNS[search_kind])
+    return search.fetch_ranked(session, episode_m.Episode, ids)
+
+
+def episodes_page(
+    session: sqlmodel.Session, limit: int, before_date: dt.date | None = None, before_id: int | None = None
+) -> list[episode_m.Episode]:
+    """Episodes newest first, starting after the (before_date, before_id) cursor"""
+    Episode = episode_m.Episode
+    statement = sqlmodel.select(Episode).order_by(Episode.date.desc(), Episode.id.desc()).limit(limit)
+    if before_date is not None and before_id is not None:
+        statement = statement.where(sqa.tuple_(Episode.date, Episode.id) < (before_date, before_id))
+    return session.exec(statement).all()
 
-    return templates.TemplateResponse(
-        request=request, name='episode/episode_cards.html', context={'episodes': episodes}
-    )
+
+async def ep_cards_page(request: Request, session: sqlmodel.Session, before_date=None, before_id=None):
+    page_size = guru_settings().page_size
+
+    def load_context():
+        episodes = episodes_page(session, page_size + 1, before_date, before_id)
+        episodes, next_url = next_page(
+            request, 'get_ep_cards', episodes, page_size, lambda ep: {'before_date': ep.date, 'before_id': ep.id}
+        )
+        return {'episodes': episodes, 'next_url': next_url}
+
+    return await render_cached(templates(), request, session, 'episode/episode_cards.html', load_context)
+
+
+@router.get('/get_eps/', response_class=HTMLResponse)
+async def get_ep_cards(
+    request: Request,
+    before_date: dt.date | None = None,
+    before_id: int | None = None,
+    session: sqlmodel.Session = fastapi.Depends(get_session),
+):
+    return await ep_cards_page(request, session, before_date, before_id)
 
 
 @router.post('/get_eps/', response_class=HTMLResponse)
@@ -77,34 +94,43 @@ async def search_eps(
     search_str: str = Form(...),
     session: sqlmodel.Session = fastapi.Depends(get_session),
 ):
-    episodes = await from_sesh(episode_m.Episode, session)
-    if search_kind and search_str:
-        matched_episodes = episode_matches(episodes, search_str, search_kind)
-    else:
-        matched_episodes = episodes
+    if not (search_kind and search_str):
+        return await ep_cards_page(request, session)
+    matched_episodes = await run_db(episode_matches, session, search_str, search_kind)
+
+    return await run_db(
+        templates().TemplateResponse,
+        request=request,
+        name='episode/episode_cards.html',
+        context={'episodes': matched_episodes},
+    )
 
-    matched_episodes = sorted(matched_episodes, key=lambda ep: ep.date, reverse=True)
 
-    return templates.TemplateResponse(
-        request=request, name='episode/episode_cards.html', context={'episodes': matched_episodes}
-    )
+def archive_context(session: sqlmodel.Session) -> dict:
+    """Every episode newest first, read lazily in batches as the template iterates them"""
+    Episode = episode_m.Episode
+    statement = sqlmodel.select(Episode).order_by(Episode.date.desc(), Episode.id.desc())
+    return {'episodes': session.exec(statement.execution_options(yield_per=ARCHIVE_BATCH))}
+
+
+@router.get('/archive/', response_class=HTMLResponse)
+async def episode_archive(request: Request, session: sqlmodel.Session = fastapi.Depends(get_session)):
+    return stream_template(templates(), request, session, 'episode/episode_archive.html', archive_context)
 
 
 @router.get('/{ep_id}/', response_class=HTMLResponse)
 async def read_episode(ep_id: int, request: Request, sesssion: sqlmodel.Session = fastapi.Depends(get_session)):
-    episode = sesssion.get(episode_m.Episode, ep_id)
-    return templates.TemplateResponse(request=request, name='episode/episode_detail.html', context={'episode': episode})
+    episode = await run_db(sesssion.get, episode_m.Episode, ep_id, options=DETAIL_LOADS)
+    return await run_db(
+        templates().TemplateResponse, request=request, name='episode/episode_detail.html', context={'episode': episode}
+    )
 
 
 @router.get('/', response_class=HTMLResponse)
-async def all_eps(request: Request, session=fastapi.Depends(get_session)):
+async def all_eps(request: Request, session: sqlmodel.Session = fastapi.Depends(get_session)):
     logger.debug('all_eps')
-    episodes = await from_sesh(episode_m.Episode, session)
-    episodes = sorted(episodes, key=lambda ep: ep.date, reverse=True)
-    return templates.TemplateResponse(
-        request=request, name='episode/episode_index.html', context={'episodes': episodes}
-    )
+    return await render_cached(templates(), request, session, 'episode/episode_index.html')
 
 
 async def from_sesh(clz, session: sqlmodel.Session):
-    return session.exec(sqlmodel.select(clz)).all()
+    return await run_db(lambda: session.exec(sqlmodel.select(clz)).all())
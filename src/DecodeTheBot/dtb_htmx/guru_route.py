@@ -1,46 +1,100 @@
 import typing as _t
-from pathlib import Path
 
 import fastapi
+import sqlalchemy as sqa
 import sqlmodel
 from fastapi import Form, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import selectinload
 from sqlmodel import select
 from suppawt.pawlogger.config_loguru import logger
 
-from DecodeTheBot.core.database import get_session
-from DecodeTheBot.models import episode_m, guru_m, reddit_m  # noqa F401
+from DecodeTheBot.core import search
+from DecodeTheBot.core.database import get_session, run_db
+from DecodeTheBot.dtb_htmx.cache import render_cached
+from DecodeTheBot.dtb_htmx.conditional import ConditionalRoute, check_not_modified
+from DecodeTheBot.dtb_htmx.paging import next_page
+from DecodeTheBot.dtb_htmx.templating import templates
+from DecodeTheBot.guru_config import guru_settings
+from DecodeTheBot.models import episode_m, guru_m, links, reddit_m
 from DecodeTheBot.models.guru_m import Guru
 
 SearchKind = _t.Literal['name', 'episode', 'reddit']
-router = fastapi.APIRouter()
-THIS_DIR = Path(__file__).resolve().parent
-template_dir = THIS_DIR.parent / 'ui/templates'
-templates = Jinja2Templates(directory=str(template_dir))
+router = fastapi.APIRouter(route_class=ConditionalRoute, dependencies=[fastapi.Depends(check_not_modified)])
 
+# relations the detail view renders, loaded up front in one query per relation
+DETAIL_LOADS = (selectinload(Guru.episodes),)
+# newest episode titles shown on a guru card, the rest are only counted
+CARD_EPISODES = 3
 
-def guru_matches(gurus, search_str, search_kind: SearchKind = 'title'):
+
+def guru_matches(session: sqlmodel.Session, search_str: str, search_kind: SearchKind = 'name'):
+    """Gurus matching search_str in the search index, best match first
+
+    'episode' and 'reddit' find gurus linked to the best matching episodes or threads.
+    """
     match search_kind:
         case 'name':
-            matched_ = [_ for _ in gurus if search_str.lower() in _.name.lower()]
+            ids = search.search(session, Guru, search_str, column='title')
         case 'episode':
-            matched_ = [_ for _ in gurus if any(search_str.lower() in guru.name.lower() for guru in _.gurus)]
+            ep_ids = search.search(session, episode_m.Episode, search_str, column='title')
+            ids = search.linked_ids(session, links.GuruEpisodeLink, 'episode_id', 'guru_id', ep_ids)
         case 'reddit':
-            matched_ = [
-                _ for _ in gurus if any(search_str.lower() in r_thread.title.lower() for r_thread in _.reddit_threads)
-            ]
+            thread_ids = search.search(session, reddit_m.RedditThread, search_str, column='title')
+            ids = search.linked_ids(session, links.RedditThreadGuruLink, 'reddit_thread_id', 'guru_id', thread_ids)
         case _:
             raise ValueError(f'Invalid kind: {search_kind}')
-    return sorted(matched_, key=lambda ep: ep.date, reverse=True)
+    return search.fetch_ranked(session, Guru, ids)
+
+
+def card_episodes(session: sqlmodel.Session, gurus: _t.Sequence[Guru]) -> dict[int, list[str]]:
+    """Titles of the newest CARD_EPISODES episodes of each guru, in one query however many episodes they have"""
+    Episode, link = episode_m.Episode, links.GuruEpisodeLink
+    titles = {_.id: [] for _ in gurus}
+    if not titles:
+        return titles
+    rank = sqa.func.row_number().over(partition_by=link.guru_id, order_by=(Episode.date.desc(), Episode.id.desc()))
+    ranked = (
+        select(link.guru_id, Episode.title, rank.label('rank'))
+        .join(Episode, Episode.id == link.episode_id)
+        .where(link.guru_id.in_(titles))
+        .subquery()
+    )
+    rows = session.exec(
+        select(ranked.c.guru_id, ranked.c.title)
+        .where(ranked.c.rank <= CARD_EPISODES)
+        .order_by(ranked.c.guru_id, ranked.c.rank)
+    )
+    for guru_id, title in rows:
+        titles[guru_id].append(title)
+    return titles
+
+
+async def guru_cards_page(request: Request, session: sqlmodel.Session, before_interest=None, before_id=None):
+    page_size = guru_settings().page_size
+
+    def load_context():
+        gurus = session.exec(gurus_statement(page_size + 1, before_interest, before_id)).all()
+        gurus, next_url = next_page(
+            request,
+            'get_gurus',
+            gurus,
+            page_size,
+            lambda guru: {'before_interest': guru.interest, 'before_id': guru.id},
+        )
+        return {'gurus': gurus, 'episode_titles': card_episodes(session, gurus), 'next_url': next_url}
+
+    return await render_cached(templates(), request, session, 'guru/guru_cards.html', load_context)
 
 
 @router.get('/get_gurus/', response_class=HTMLResponse)
-async def get_gurus(request: Request, session: sqlmodel.Session = fastapi.Depends(get_session)):
-    gurus = await gurus_from_sesh(session)
-    # gurus = sorted(gurus, key=lambda ep: ep.date, reverse=True)
-
-    return templates.TemplateResponse(request=request, name='guru/guru_cards.html', context={'gurus': gurus})
+async def get_gurus(
+    request: Request,
+    before_interest: int | None = None,
+    before_id: int | None = None,
+    session: sqlmodel.Session = fastapi.Depends(get_session),
+):
+    return await guru_cards_page(request, session, before_interest, before_id)
 
 
 @router.post('/get_gurus/', response_class=HTMLResponse)
@@ -50,31 +104,43 @@ async def search_gurus(
     search_str: str = Form(...),
     session: sqlmodel.Session = fastapi.Depends(get_session),
 ):
-    gurus = await gurus_from_sesh(session)
-
-    if search_kind and search_str:
-        matched_gurus = guru_matches(gurus, search_str, search_kind)
-    else:
-        matched_gurus = gurus
+    if not (search_kind and search_str):
+        return await guru_cards_page(request, session)
 
-    matched_gurus = sorted(matched_gurus, key=lambda guru: guru.name)
+    def load_context():
+        gurus = guru_matches(session, search_str, search_kind)
+        return {'gurus': gurus, 'episode_titles': card_episodes(session, gurus)}
 
-    return templates.TemplateResponse(request=request, name='guru/guru_cards.html', context={'gurus': matched_gurus})
+    context = await run_db(load_context)
+    return await run_db(templates().TemplateResponse, request=request, name='guru/guru_cards.html', context=context)
 
 
 @router.get('/{guru_id}/', response_class=HTMLResponse)
 async def read_guru(guru_id: int, request: Request, sesssion: sqlmodel.Session = fastapi.Depends(get_session)):
-    guru = sesssion.get(guru_m.Guru, guru_id)
-    return templates.TemplateResponse(request=request, name='guru/guru_detail.html', context={'guru': guru})
+    guru = await run_db(sesssion.get, guru_m.Guru, guru_id, options=DETAIL_LOADS)
+    return await run_db(
+        templates().TemplateResponse, request=request, name='guru/guru_detail.html', context={'guru': guru}
+    )
 
 
 @router.get('/', response_class=HTMLResponse)
-async def all_gurus(request: Request, session=fastapi.Depends(get_session)):
+async def all_gurus(request: Request, session: sqlmodel.Session = fastapi.Depends(get_session)):
     logger.debug('all_gurus')
-    gurus = await gurus_from_sesh(session)
-    return templates.TemplateResponse(request=request, name='guru/guru_index.html', context={'gurus': gurus})
+    return await render_cached(templates(), request, session, 'guru/guru_index.html')
+
+
+async def gurus_from_sesh(
+    session: sqlmodel.Session,
+    limit: int | None = None,
+    before_interest: int | None = None,
+    before_id: int | None = None,
+):
+    return await run_db(lambda: session.exec(gurus_statement(limit, before_interest, before_id)).all())
 
 
-async def gurus_from_sesh(session: sqlmodel.Session):
-    statement = select(Guru).where(Guru.episodes or Guru.reddit_threads)
-    return session.exec(statement).all()
+def gurus_statement(limit: int | None = None, before_interest: int | None = None, before_id: int | None = None):
+    """Gurus with any links, most interesting first, starting after the (before_interest, before_id) cursor"""
+    statement = select(Guru).where(Guru.interest > 0).order_by(Guru.interest.desc(), Guru.id.desc()).limit(limit)
+    if before_interest is not None and before_id is not None:
+        statement = statement.where(sqa.tuple_(Guru.interest, Guru.id) < (before_interest, before_id))
+    return statement
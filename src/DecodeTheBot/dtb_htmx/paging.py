@@ -0,0 +1,24 @@
+from collections.abc import Callable, Sequence
+
+from fastapi import Request
+
+
+def next_page(
+    request: Request, route_name: str, rows: Sequence, page_size: int, cursor: Callable[[object], dict]
+) -> tuple[list, str | None]:
+    """Trim rows fetched with page_size + 1 to one page, with the url of the next page if there is one
+
+    Args:
+        request (Request): Current request
+        route_name (str): Name of the route serving further pages
+        rows (Sequence): Up to page_size + 1 rows in page order
+        page_size (int): Rows per page
+        cursor (Callable): Query params for the page after a given row
+
+    Returns:
+        tuple: Rows of this page, url of the next page or None
+    """
+    if len(rows) <= page_size:
+        return list(rows), None
+    page = list(rows[:page_size])
+    return page, str(request.url_for(route_name).include_query_params(**cursor(page[-1])))
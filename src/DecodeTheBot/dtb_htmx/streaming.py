@@ -0,0 +1,58 @@
+from collections.abc import Callable, Iterator
+
+import sqlmodel
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+
+CHUNK_BYTES = 16 * 1024
+
+
+def render_chunks(
+    templates: Jinja2Templates,
+    request: Request,
+    name: str,
+    engine,
+    load_context: Callable[[sqlmodel.Session], dict],
+    chunk_bytes: int = CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """Render a template piece by piece, joining Jinja's small fragments into chunks of about chunk_bytes
+
+    The session lives as long as the generator, so load_context can return lazy results that are read as the
+    template iterates them.
+    """
+    with sqlmodel.Session(engine) as session:
+        context = load_context(session)
+        context.setdefault('request', request)
+        buffer, size = [], 0
+        for fragment in templates.get_template(name).generate(context):
+            buffer.append(fragment)
+            size += len(fragment)
+            if size >= chunk_bytes:
+                yield ''.join(buffer).encode()
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer).encode()
+
+
+def stream_template(
+    templates: Jinja2Templates,
+    request: Request,
+    session: sqlmodel.Session,
+    name: str,
+    load_context: Callable[[sqlmodel.Session], dict],
+) -> StreamingResponse:
+    """Stream a rendered template, sending the head of the page before any rows are read
+
+    Dependencies are closed before a streaming body is sent, so rendering opens its own session on the bind of
+    the request's session. Starlette iterates the sync generator in a worker thread, off the event loop.
+
+    Args:
+        templates (Jinja2Templates): Templates to render from
+        request (Request): Current request
+        session (sqlmodel.Session): Request session, only used for its engine
+        name (str): Template name
+        load_context (Callable): Blocking function taking the rendering session, returning the template context
+    """
+    chunks = render_chunks(templates, request, name, session.get_bind(), load_context)
+    return StreamingResponse(chunks, media_type='text/html')
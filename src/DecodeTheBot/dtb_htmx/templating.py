@@ -0,0 +1,22 @@
+import functools
+from pathlib import Path
+
+import jinja2
+from fastapi.templating import Jinja2Templates
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / 'ui/templates'
+
+
+@functools.lru_cache
+def templates() -> Jinja2Templates:
+    """Templates for every router, built on first use
+
+    Compiled templates are kept in a bytecode cache in the temp dir, so a restarted process loads them without
+    parsing and compiling the sources again.
+    """
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=jinja2.FileSystemBytecodeCache(),
+    )
+    return Jinja2Templates(env=env)
@@ -0,0 +1,96 @@
+import functools
+import threading
+
+import fastapi
+import sqlalchemy as sqa
+import sqlmodel
+from fastapi import Query, Request
+from fastapi.responses import HTMLResponse
+from loguru import logger
+
+from DecodeTheBot.core import database
+from DecodeTheBot.core.database import get_session, read_engine_, run_db
+from DecodeTheBot.core.trigram import TrigramIndex
+from DecodeTheBot.dtb_htmx.conditional import ConditionalRoute, check_not_modified, current_version
+from DecodeTheBot.dtb_htmx.templating import templates
+from DecodeTheBot.models import episode_m, guru_m, reddit_m
+
+router = fastapi.APIRouter(route_class=ConditionalRoute, dependencies=[fastapi.Depends(check_not_modified)])
+
+# (text, url) columns indexed for each model
+SOURCES = {
+    episode_m.Episode: (episode_m.Episode.title, '/eps/' + sqa.cast(episode_m.Episode.id, sqa.String)),
+    guru_m.Guru: (guru_m.Guru.name, '/guru/' + sqa.cast(guru_m.Guru.id, sqa.String)),
+    reddit_m.RedditThread: (reddit_m.RedditThread.title, reddit_m.RedditThread.shortlink),
+}
+
+
+class Typeahead:
+    """Trigram index over episode titles, guru names and thread titles, kept up to date by data version
+
+    The bot adds rows with ascending ids, so a refresh loads the rows with ids above the last seen id of each model.
+    Rows are only deleted by trimming, which a count of the indexed ids detects, and then the missing ids are removed.
+    """
+
+    def __init__(self):
+        self.index = TrigramIndex()
+        self.version = -1
+        self.last_ids = dict.fromkeys(SOURCES, 0)
+        self.keys: dict[type, dict[int, tuple[str, str]]] = {model: {} for model in SOURCES}
+        self._lock = threading.Lock()
+
+    def refresh(self, session: sqlmodel.Session, version: int):
+        with self._lock:
+            if version <= self.version:
+                return
+            for model, (text, url) in SOURCES.items():
+                self._remove_deleted(session, model)
+                rows = session.exec(
+                    sqlmodel.select(model.id, text, url).where(model.id > self.last_ids[model]).order_by(model.id)
+                ).all()
+                for id_, text_, url_ in rows:
+                    self.keys[model][id_] = key = (model.__name__, url_)
+                    self.index.add(key, text_)
+                if rows:
+                    self.last_ids[model] = rows[-1][0]
+            self.version = version
+
+    def _remove_deleted(self, session: sqlmodel.Session, model):
+        keys = self.keys[model]
+        seen = model.id <= self.last_ids[model]
+        if session.exec(sqlmodel.select(sqa.func.count()).where(seen)).one() == len(keys):
+            return
+        gone = keys.keys() - set(session.exec(sqlmodel.select(model.id).where(seen)).all())
+        for id_ in gone:
+            self.index.remove(keys.pop(id_))
+        logger.debug(f'Removed {len(gone)} deleted {model.__name__} rows from typeahead index')
+
+
+@functools.lru_cache
+def typeahead_index() -> Typeahead:
+    return Typeahead()
+
+
+def warm_typeahead():
+    """Build the index at startup rather than on the first request"""
+    try:
+        with sqlmodel.Session(read_engine_()) as session:
+            typeahead_index().refresh(session, database.data_version(session).data_version)
+    except sqa.exc.OperationalError as e:
+        logger.warning(f'Typeahead index not built, database not ready: {e}')
+
+
+@router.get('/', response_class=HTMLResponse)
+async def typeahead(
+    request: Request,
+    q: str = '',
+    k: int = Query(10, ge=1, le=50),
+    session: sqlmodel.Session = fastapi.Depends(get_session),
+):
+    index = typeahead_index()
+    version = (await current_version(request, session)).data_version
+    if version > index.version:
+        await run_db(index.refresh, session, version)
+    # a lookup takes a few milliseconds, cheaper than a thread hop
+    hits = index.index.search(q, k)
+    return await run_db(templates().TemplateResponse, request=request, name='typeahead.html', context={'hits': hits})
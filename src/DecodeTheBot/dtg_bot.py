@@ -1,24 +1,35 @@
 import asyncio
-from asyncio import Queue, Task
+import datetime as dt
+import time
+from asyncio import Task
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict
 
 import pydantic as _p
+import sqlalchemy as sqa
 import sqlmodel as sqm
 from aiohttp import ClientSession
 from asyncpraw import Reddit
 from asyncpraw.reddit import Subreddit
 from dotenv import load_dotenv
 from loguru import logger
-from pydantic import alias_generators
-
-# import suppawt.convert
 from scrapaw import dtg, pod_abs
-from sqlmodel import select
 from suppawt import get_values, pawsync
 
-from .core import database
-from .dtg_types import DB_MODEL_TYPE, DB_MODEL_VAR
+from . import dtg_types, guru_config
+from .core import database, durable, search, watermarks
+from .core.dedupe import HashIndex
+from .core.durable import QueueEntry
+from .core.http import scraper_session
+from .core.http_cache import CacheStats, CachingSession
+from .core.matcher import Matcher
+from .core.queues import MonitoredQueue
+from .core.scheduler import PollScheduler, RateLimit
 from .guru_config import GuruConfig, RedditConfig
 from .models import episode_m, guru_m, reddit_m
+from .models.meta import Watermark
 from .models.reddit_m import RedditThread
 
 load_dotenv()
@@ -36,19 +47,31 @@ class DTG:
             reddit_settings (RedditConfig): Reddit Configuration
             guru_settings (GuruConfig): Guru Configuration
         """
-        self.r_settings = reddit_settings or RedditConfig()
-        self.g_settings = guru_settings or GuruConfig()
-        self.episode_q = Queue()
-        self.reddit_q = Queue()
+        self.r_settings = reddit_settings or guru_config.reddit_settings()
+        self.g_settings = guru_settings or guru_config.guru_settings()
+        self.episode_q = MonitoredQueue(self.g_settings.episode_q_maxsize, name='episode')
+        self.reddit_q = MonitoredQueue(self.g_settings.reddit_q_maxsize, name='reddit')
+        self.episode_poller = PollScheduler(
+            'episode', self.g_settings.scraper_sleep, self.g_settings.poll_min_sleep, self.g_settings.poll_max_sleep
+        )
+        self.reddit_poller = PollScheduler(
+            'reddit', self.g_settings.reddit_sleep, self.g_settings.poll_min_sleep, self.g_settings.poll_max_sleep
+        )
         self.tasks: list[Task] = list()
+        self.pollers: list[Task] = list()
         self.reddit: Reddit | None = None
         self.subreddit: Subreddit | None = None
-        self.http_session: ClientSession | None = None
-        self.sqm_session: sqm.Session | None = None
+        self.http_session: ClientSession | CachingSession | None = None
+        self.http_cache_stats: CacheStats | None = None
+        self.engine: sqa.Engine | None = None
+        self.hash_index: dict[type, HashIndex] = dict()
+        self.matchers: dict[type, Matcher] = dict()
+        self.watermarks: dict[type, Watermark] = dict()
 
     async def __aenter__(self):
-        self.http_session = ClientSession()
-        self.sqm_session = sqm.Session(database.engine_())
+        self.http_session = scraper_session(self.g_settings)
+        self.engine = database.engine_()
+        await database.run_write(self.load_indexes)
         self.reddit = Reddit(
             client_id=self.r_settings.client_id,
             client_secret=self.r_settings.client_secret,
@@ -61,121 +84,248 @@ class DTG:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.reddit.close()
-        self.sqm_session.close()
         await self.http_session.close()
 
+    @contextmanager
+    def unit_of_work(self) -> Iterator[sqm.Session]:
+        """Session for one unit of work, eg a batch
+
+        The bot runs for weeks, so no session outlives its work and the rows it loaded are freed when it closes.
+        Rows stay readable after commit, they are not expired.
+        """
+        with sqm.Session(self.engine, expire_on_commit=False) as session:
+            yield session
+
+    def load_indexes(self):
+        """Build the dedupe indexes and matchers from the database"""
+        with self.unit_of_work() as session:
+            self.hash_index = {
+                model: HashIndex.from_session(session, model) for model in (episode_m.Episode, reddit_m.RedditThread)
+            }
+            self.matchers = {
+                model: Matcher.from_session(session, model)
+                for model in (episode_m.Episode, reddit_m.RedditThread, guru_m.Guru)
+            }
+            self.watermarks = watermarks.load(session)
+
+    def add_gurus_from_file(self):
+        """Add gurus from the configured names file to the database and the guru matcher"""
+        with self.unit_of_work() as session:
+            gurus = gurus_from_file(session, self.g_settings.guru_names_file)
+            for guru in gurus:
+                self.matchers[guru_m.Guru].add_obj(guru)
+            if gurus:
+                search.index_rows(session, guru_m.Guru, [_.id for _ in gurus])
+                database.bump_data_version(session)
+                session.commit()
+
     async def run(self):
         """Run the bot
 
-        spawn queue managers and processors for episodes and reddit threads
+        spawn processors for episodes and reddit threads, requeue items left by the last run, then spawn the
+        queue managers
         """
         logger.info('Initialised')
-        with self.sqm_session as session:
-            gurus_from_file(session, self.g_settings.guru_names_file)
-
-            self.tasks = [
-                asyncio.create_task(self.episode_q_manager()),
-                asyncio.create_task(self.reddit_q_manager()),
-                asyncio.create_task(
-                    self.process_queue(
-                        self.reddit_q,
-                        reddit_m.RedditThread,
-                        log_category='reddit',
-                        relation_classes=[episode_m.Episode, guru_m.Guru],
-                    )
-                ),
-                asyncio.create_task(
-                    self.process_queue(
-                        self.episode_q,
-                        episode_m.Episode,
-                        log_category='episode',
-                        relation_classes=[reddit_m.RedditThread, guru_m.Guru],
-                    )
-                ),
-            ]
-            logger.info('Tasks created')
+        await database.run_write(self.add_gurus_from_file)
+
+        self.tasks = [
+            asyncio.create_task(
+                self.process_queue(
+                    self.reddit_q,
+                    reddit_m.RedditThread,
+                    log_category='reddit',
+                    relation_classes=[episode_m.Episode, guru_m.Guru],
+                )
+            ),
+            asyncio.create_task(
+                self.process_queue(
+                    self.episode_q,
+                    episode_m.Episode,
+                    log_category='episode',
+                    relation_classes=[reddit_m.RedditThread, guru_m.Guru],
+                )
+            ),
+        ]
+        await self.restore_queues()
+        self.pollers = [
+            asyncio.create_task(self.episode_q_manager()),
+            asyncio.create_task(self.reddit_q_manager()),
+        ]
+        self.tasks.extend(self.pollers)
+        logger.info('Tasks created')
+
+    async def restore_queues(self):
+        """Queue again, oldest first, the items a previous run fetched but never committed"""
+        for queue, model in ((self.episode_q, episode_m.Episode), (self.reddit_q, reddit_m.RedditThread)):
+            entries = await database.run_write(self.pending_entries, queue.name, model)
+            if not entries:
+                continue
+            logger.info(f'Restoring {len(entries)} queued {model.__name__}s', category=queue.name)
+            for entry in entries:
+                self.hash_index[model].reserve(entry.item.get_hash)
+            self.move_mark(model, watermarks.newest(model, [_.item for _ in entries]))
+            for entry in entries:
+                await queue.put(entry)
+
+    def pending_entries(self, queue_name: str, model) -> list[QueueEntry]:
+        with self.unit_of_work() as session:
+            return durable.pending(session, queue_name, model)
+
+    def persist_entries(self, queue_name: str, items: list) -> list[QueueEntry]:
+        with self.unit_of_work() as session:
+            return durable.persist(session, queue_name, items)
+
+    def move_mark(self, model, mark: Watermark | None):
+        """Let the next fetch of model stop at mark, unless it already stops at a newer item"""
+        current = self.watermarks.get(model)
+        if mark is not None and (current is None or mark.position >= current.position):
+            self.watermarks[model] = mark
+
+    def queue_stats(self) -> dict[str, dict]:
+        """Depth, throughput and time-in-queue for the episode and reddit queues"""
+        return {q.name: asdict(q.stats()) for q in (self.episode_q, self.reddit_q)}
+
+    def poll_stats(self) -> dict[str, dict]:
+        """Interval, error counts and fetch latency for the podcast feed and reddit pollers"""
+        return {p.name: asdict(p.stats()) for p in (self.episode_poller, self.reddit_poller)}
 
     @pawsync.quiet_cancel
-    async def kill(self):
-        """Kill the bot"""
+    async def kill(self, drain_timeout: float | None = None):
+        """Kill the bot
+
+        Pollers stop first, then the processors get up to drain_timeout seconds (default the drain_timeout setting)
+        to commit what is already queued. Anything left stays persisted and is requeued on the next start.
+        """
         logger.info('Killing')
+        drain_timeout = self.g_settings.drain_timeout if drain_timeout is None else drain_timeout
+        for task in self.pollers:
+            task.cancel()
+        processors = [_ for _ in self.tasks if _ not in self.pollers]
+        if drain_timeout > 0 and self.pollers and not any(_.done() for _ in processors):
+            try:
+                await asyncio.wait_for(asyncio.gather(self.episode_q.join(), self.reddit_q.join()), drain_timeout)
+            except TimeoutError:
+                depth = self.episode_q.qsize() + self.reddit_q.qsize()
+                logger.warning(f'Queues not drained in {drain_timeout}s, {depth} items left for the next start')
         for task in self.tasks:
             task.cancel()
         await asyncio.gather(*self.tasks)
 
     @pawsync.quiet_cancel
     async def episode_q_manager(self):
-        """Manage episode scraping"""
-        while True:
-            try:
-                await self.get_episodes()
-                logger.debug(
-                    f'Episode manager sleeping for {self.g_settings.scraper_sleep} seconds', category='episode'
-                )
-            except pod_abs.MaxDupeError:
-                logger.debug('Maximum Duplicate Episodes Reached', category='episode')
-            except Exception as e:
-                logger.exception(f'Error getting episodes: {e}', category='episode')
-            await asyncio.sleep(self.g_settings.scraper_sleep)
+        """Poll the podcast feed for episodes at an interval adapted to how often they appear"""
+        await self.episode_poller.run(self.poll_episodes, log_category='episode')
+
+    async def poll_episodes(self) -> int:
+        """Get new episodes, returning how many were queued"""
+        queued = self.episode_q.enqueued
+        try:
+            await self.get_episodes()
+        except pod_abs.MaxDupeError:
+            logger.debug('Maximum Duplicate Episodes Reached', category='episode')
+        finally:
+            self.record_http_cache()
+        logger.debug(f'{self.episode_q.stats()}', category='episode')
+        return self.episode_q.enqueued - queued
 
     async def get_episodes(self, max_dupes: int = None):
-        """Get episodes from the podcast feed and add them to the episode queue"""
+        """Get episodes newer than the high-water mark from the podcast feed and add them to the episode queue
+
+        The feed lists newest first, fetching stops at the mark. Without a mark, max_dupes known episodes end it.
+        """
         logger.debug('Getting Episodes', category='episode')
         max_dupes = max_dupes or self.g_settings.max_dupes
+        mark = self.watermarks.get(episode_m.Episode)
         dupes = 0
-        ep_count = 0
+        new_eps = []
+        # scrapaw walks the listing and detail pages one request at a time, it has no step taking page urls for
+        # core.http.fetch_ordered to run through the pool
         async for ep_ in dtg.get_episodes_blind(
             base_url=str(self.g_settings.podcast_url),
             session_h=self.http_session,
             limit=self.g_settings.episode_scrape_limit,
         ):
             ep = episode_m.Episode.model_validate(ep_)
-            if ep.get_hash in [_.get_hash for _ in self.sqm_session.exec(select(episode_m.Episode)).all()]:
+            if watermarks.passed(mark, ep.get_hash, ep.date):
+                logger.debug(f'Reached episode high-water mark: {mark.position}', category='episode')
+                break
+            if ep.get_hash in self.hash_index[episode_m.Episode]:
                 dupes += 1
-                if max_dupes and dupes > max_dupes:
+                if mark is None and max_dupes and dupes > max_dupes:
                     logger.debug(f'Maximum duplicate episodes reached: {max_dupes}')
-                    raise pod_abs.MaxDupeError('Max duplicate episodes reached')
+                    break
                 continue
-            ep_count += 1
             logger.debug(f'Found Episode: {ep.title}', category='episode')
-            await self.episode_q.put(ep)
-        logger.debug(f'Episode Queue Empty after adding {ep_count} New Episodes', category='episode')
+            self.hash_index[episode_m.Episode].reserve(ep.get_hash)
+            new_eps.append(ep)
+        await self.queue_oldest_first(self.episode_q, new_eps)
+        logger.debug(f'Added {len(new_eps)} New Episodes', category='episode')
 
-    @pawsync.quiet_cancel
-    async def reddit_q_manager(self):
-        """Manage Reddit Thread Scraping"""
-        while True:
-            try:
-                await self.get_reddit_threads()
-            except pod_abs.MaxDupeError:
-                logger.debug(
-                    'Maximum Duplicate Threads Reached',
-                    category='reddit',
-                )
-            except Exception as e:
-                logger.exception(f'Error getting Reddit Threads: {e}', category='reddit')
+    async def queue_oldest_first(self, queue, items: list):
+        """Persist and queue items found newest first in publication order, so the high-water mark never skips one
 
-            logger.debug(f'RedditBot Sleeping for {self.g_settings.reddit_sleep} seconds', category='reddit')
-            await asyncio.sleep(self.g_settings.reddit_sleep)
-
-    async def get_reddit_threads(self, max_dupes: int = None) -> None:
-        """Get Reddit Threads from the subreddit and add them to the reddit queue
+        Once they are persisted the next fetch can stop at the newest of them, they will be committed or requeued.
+        """
+        if not items:
+            return
+        entries = await database.run_write(self.persist_entries, queue.name, items[::-1])
+        self.move_mark(type(items[0]), watermarks.newest(type(items[0]), items))
+        for entry in entries:
+            await queue.put(entry)
+
+    def record_http_cache(self):
+        """Keep and log the http cache stats of the poll just finished"""
+        if not isinstance(self.http_session, CachingSession):
+            return
+        stats = self.http_cache_stats = self.http_session.take_stats()
+        logger.info(
+            f'HTTP cache: {stats.hits}/{stats.requests} pages unchanged ({stats.hit_rate:.0%}), '
+            f'{stats.bytes_saved / 1024:.0f}KiB saved, {stats.bytes_downloaded / 1024:.0f}KiB downloaded',
+            category='episode',
+        )
 
-        Args:
-            max_dupes (int): Maximum number of duplicate threads to allow before sleeping
+    @pawsync.quiet_cancel
+    async def reddit_q_manager(self):
+        """Poll the subreddit for threads, adapting to posting frequency and Reddit's rate limit"""
+        await self.reddit_poller.run(self.poll_reddit_threads, self.reddit_rate_limit, log_category='reddit')
+
+    async def poll_reddit_threads(self) -> int:
+        """Get new Reddit Threads, returning how many were queued"""
+        queued = self.reddit_q.enqueued
+        await self.get_reddit_threads()
+        logger.debug(f'{self.reddit_q.stats()}', category='reddit')
+        return self.reddit_q.enqueued - queued
+
+    def reddit_rate_limit(self) -> RateLimit:
+        """Requests remaining and seconds until reset, as asyncprawcore last read them from Reddit's headers"""
+        limiter = getattr(getattr(self.reddit, '_core', None), '_rate_limiter', None)
+        remaining = getattr(limiter, 'remaining', None)
+        reset_timestamp = getattr(limiter, 'reset_timestamp', None)
+        if remaining is None or reset_timestamp is None:
+            return None, None
+        return remaining, max(reset_timestamp - time.time(), 0)
+
+    async def get_reddit_threads(self) -> None:
+        """Get Reddit Threads newer than the high-water mark from the subreddit and add them to the reddit queue
+
+        New submissions list newest first, so the walk stops at the mark before validating anything already seen.
         """
-        max_dupes = max_dupes or self.g_settings.max_dupes
-        dupes = 0
-        async for sub in self.subreddit.stream.submissions(skip_existing=False):
-            thrd = reddit_m.RedditThread.from_submission(sub)
-            if thrd.get_hash in [_.get_hash for _ in self.sqm_session.exec(select(RedditThread)).all()]:
-                dupes += 1
-                if max_dupes and dupes > max_dupes:
-                    raise pod_abs.MaxDupeError(f'Max dupes reached: {max_dupes}')
+        mark = self.watermarks.get(RedditThread)
+        new_threads = []
+        async for sub in self.subreddit.new(limit=self.g_settings.reddit_fetch_limit):
+            created = dt.datetime.fromtimestamp(sub.created_utc, dt.UTC)
+            if watermarks.passed(mark, sub.id, created):
+                logger.debug(f'Reached reddit high-water mark: {mark.position}', category='reddit')
+                break
+            thrd = reddit_m.RedditThread.from_submission(
+                sub, self.g_settings.submission_fields, self.g_settings.keep_raw_submission
+            )
+            if thrd.get_hash in self.hash_index[RedditThread]:
                 continue
-
             logger.info(f'Found Reddit Thread: {thrd.title}', category='reddit')
-            await self.reddit_q.put(thrd)
+            self.hash_index[RedditThread].reserve(thrd.get_hash)
+            new_threads.append(thrd)
+        await self.queue_oldest_first(self.reddit_q, new_threads)
 
     @pawsync.quiet_cancel
     async def process_queue(
@@ -185,151 +335,174 @@ class DTG:
         relation_classes: list[type(_p.BaseModel)],
         log_category: str = 'General',
     ):
-        """Process items from the queue
+        """Process items from the queue in batches
 
         Args:
-            queue (Queue): Queue to process
+            queue (MonitoredQueue): Queue to process
             model_class (type): Model class to validate
             relation_classes (list[type]): List of related classed to check for matches
             log_category (str): organise log entries into categories
         """
         while True:
-            item_ = await queue.get()
-            item = model_class.model_validate(item_)
-            item_str = f'{item.__class__.__name__} - {get_values.title_or_name_val(item)}'
-            logger.debug(f'Processing {item_str}', category=log_category)
-
-            self.sqm_session.add(item)
-            for relation_class in relation_classes:
-                await self.assign_rel(item, relation_class)
-
-            self.sqm_session.commit()
-            self.sqm_session.refresh(item)
-            queue.task_done()
-            logger.info(f'Processed {item_str}', category=log_category)
-
-    async def assign_rel(self, item, relation_class):
-        """Add related items to the item"""
-        related_items = db_obj_matches(self.sqm_session, item, relation_class)
-        alias = alias_generators.to_snake(relation_class.__name__) + 's'
-        getattr(item, alias).extend(related_items)
-
-    # async def process_ep_queue(self):
-    #     while True:
-    #         episode_ = await self.episode_q.get()
-    #         episode = episode_m.DTGEpisodeDB.model_validate(episode_)
-    #
-    #         gurus = db_obj_matches(self.sqm_session, episode, guru_m.Guru)
-    #         threads = db_obj_matches(self.sqm_session, episode, reddit_m.RedditThread)
-    #         episode.gurus.extend(gurus)
-    #         episode.reddit_ms.extend(threads)
-    #
-    #         self.sqm_session.add(episode)
-    #
-    #         logger.info(
-    #             f"Processing {episode.__class__.__name__} - {get_values.title_or_name_val(episode)}"
-    #         )
-    #         self.sqm_session.commit()
-    #         self.episode_q.task_done()
-    #
-    # async def process_reddit_q(self):
-    #     while True:
-    #         thread_ = await self.reddit_q.get()
-    #         thread = reddit_m.RedditThread.model_validate(thread_)
-    #
-    #         gurus = db_obj_matches(self.sqm_session, thread, guru_m.Guru)
-    #         episodes = db_obj_matches(self.sqm_session, thread, episode_m.DTGEpisodeDB)
-    #         thread.gurus.extend(gurus)
-    #         thread.episodes.extend(episodes)
-    #
-    #         self.sqm_session.add(thread)
-    #
-    #         logger.info(
-    #             f"Processing {thread.__class__.__name__} - {get_values.title_or_name_val(thread)}"
-    #         )
-    #         self.sqm_session.commit()
-    #         self.reddit_q.task_done()
-
-
-def db_obj_matches(session: sqm.Session, obj: DB_MODEL_TYPE, model: type(DB_MODEL_VAR)) -> list[DB_MODEL_VAR]:
-    """Get matching objects from the database
-
-    Args:
-        session (sqlmodel.Session): Database session
-        obj (DB_MODEL_TYPE): Object to match
-        model (type): Model to match against
-
-    Returns:
-        list: List of matching objects
-
-    """
-    if isinstance(obj, model):
-        return []
-    db_objs = session.exec(sqm.select(model)).all()
-    identifier = get_values.title_or_name_val(obj)
-    obj_var = get_values.title_or_name_var(model)
-
-    if matched_tag_models := [_ for _ in db_objs if one_in_other(_, obj_var, identifier)]:
-        logger.debug(
-            f"Found {len(matched_tag_models)} '{model.__name__}' {'match' if len(matched_tag_models) == 1 else 'matches'} for {obj.__class__.__name__} - {identifier}"
-        )
-    return matched_tag_models
-
+            batch = await self.next_batch(queue)
+            items = [_.item for _ in batch]
+            try:
+                await database.run_write(
+                    self.commit_batch, items, model_class, relation_classes, log_category, [_.id for _ in batch]
+                )
+            # whatever sinks a batch, the consumer must live on to drain the queue, the items stay durably queued
+            except Exception as e:  # noqa: BLE001
+                logger.exception(
+                    f'Failed to commit batch of {len(batch)}: {type(e).__name__}: {e}', category=log_category
+                )
+                for item_ in items:
+                    self.hash_index[model_class].release(item_.get_hash)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def next_batch(self, queue) -> list:
+        """Wait for an item, then collect more until the batch is full or the batch window closes"""
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.g_settings.process_batch_window
+        while len(batch) < self.g_settings.process_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except TimeoutError:
+                break
+        return batch
 
-def one_in_other(obj: DB_MODEL_VAR, obj_var: str, compare_val: str) -> bool:
-    """Check if one string is in another
+    def commit_batch(
+        self,
+        batch: list,
+        model_class: type(_p.BaseModel),
+        relation_classes: list[type(_p.BaseModel)],
+        log_category: str = 'General',
+        acks: list[int] = (),
+    ) -> list:
+        """Insert a batch of items and their link rows, committing once
+
+        Items that fail validation or insertion are logged and dropped without losing the rest of the batch.
+        Items whose content hash is already stored are skipped by the database in the same insert.
+        The batch gets its own session, closed once it commits.
+        acks are the ids of the batch's persisted queue entries, in batch order. Entries of stored and skipped
+        items are deleted in the same commit, those of dropped items stay queued to be retried on the next start.
+
+        Returns:
+            list: List of committed items
+        """
+        items, entry_ids = [], {}
+        for item_, ack in zip(batch, acks or [None] * len(batch)):
+            try:
+                items.append(item := model_class.model_validate(item_))
+                entry_ids[id(item)] = ack
+            except _p.ValidationError as e:
+                logger.error(f'Invalid {model_class.__name__}: {e}', category=log_category)
+                self.hash_index[model_class].release(item_.get_hash)
+        logger.debug(f'Processing {len(items)} {model_class.__name__}s', category=log_category)
+
+        with self.unit_of_work() as session:
+            failed = []
+            try:
+                inserted = database.insert_new(session, model_class, items)
+            except sqa.exc.SQLAlchemyError as e:
+                logger.warning(f'Batch insert failed, retrying items singly: {e}', category=log_category)
+                session.rollback()
+                inserted, failed = self.add_singly(session, items, model_class, log_category)
+            kept = {id(_) for _ in inserted + failed}
+            if skipped := [_ for _ in items if id(_) not in kept]:
+                logger.debug(f'Skipped {len(skipped)} {model_class.__name__}s already stored', category=log_category)
+                for item in skipped:
+                    self.hash_index[model_class].release(item.get_hash)
 
-    Args:
-        obj (DB_MODEL_VAR): Object to check
-        obj_var (str): Attribute to check
-        compare_val (str): Value to compare
+            for relation_class in relation_classes:
+                if link_rows := [row for item in inserted for row in self.link_rows(item, relation_class)]:
+                    session.execute(sqa.insert(dtg_types.link_model(model_class, relation_class)), link_rows)
+                    if relation_class is guru_m.Guru:
+                        count_guru_links(session, model_class, link_rows)
+
+            mark = watermarks.advance(session, model_class, inserted)
+            committed = [(item.id, item.get_hash, get_values.title_or_name_val(item)) for item in inserted]
+            search.index_rows(session, model_class, [_[0] for _ in committed])
+            durable.ack(session, [entry_ids[id(_)] for _ in inserted + skipped if entry_ids[id(_)] is not None])
+            database.bump_data_version(session)
+            session.commit()
+        self.move_mark(model_class, mark)
+        for id_, hash_, identifier in committed:
+            self.hash_index[model_class].commit(hash_)
+            self.matchers[model_class].add(id_, identifier)
+            logger.info(f'Processed {model_class.__name__} - {identifier}', category=log_category)
+        return inserted
+
+    def add_singly(
+        self, session: sqm.Session, items: list, model_class: type(_p.BaseModel), log_category: str = 'General'
+    ) -> tuple[list, list]:
+        """Insert items one at a time, each in its own savepoint, dropping those that fail
+
+        Returns:
+            tuple: Items inserted and items that failed
+        """
+        added, failed = [], []
+        for item in items:
+            try:
+                with session.begin_nested():
+                    added.extend(database.insert_new(session, model_class, [item]))
+            except sqa.exc.SQLAlchemyError as e:
+                logger.error(f'Failed to add {get_values.title_or_name_val(item)}: {e}', category=log_category)
+                self.hash_index[model_class].release(item.get_hash)
+                failed.append(item)
+        return added, failed
+
+    def link_rows(self, item, relation_class) -> list[dict[str, int]]:
+        """Link table rows joining item to its matches in relation_class"""
+        if isinstance(item, relation_class):
+            return []
+        identifier = get_values.title_or_name_val(item)
+        if matched_ids := self.matchers[relation_class].matches(identifier):
+            found = 'match' if len(matched_ids) == 1 else 'matches'
+            logger.debug(
+                f"Found {len(matched_ids)} '{relation_class.__name__}' {found} for {type(item).__name__} - {identifier}"
+            )
+        item_field, rel_field = dtg_types.link_field(item.__class__), dtg_types.link_field(relation_class)
+        return [{item_field: item.id, rel_field: rel_id} for rel_id in matched_ids]
+
+
+GURU_COUNTERS = {episode_m.Episode: 'episode_count', reddit_m.RedditThread: 'thread_count'}
+
+
+def count_guru_links(session: sqm.Session, model_class, link_rows: list[dict[str, int]]):
+    """Add newly inserted links to the linked gurus' counters, so interest never needs counting at read time"""
+    counts = Counter(row['guru_id'] for row in link_rows)
+    guru = guru_m.Guru.__table__
+    counter = guru.c[GURU_COUNTERS[model_class]]
+    session.execute(
+        sqa.update(guru)
+        .where(guru.c.id == sqa.bindparam('guru_id'))
+        .values({counter: counter + sqa.bindparam('n'), guru.c.interest: guru.c.interest + sqa.bindparam('n')}),
+        [{'guru_id': guru_id, 'n': n} for guru_id, n in counts.items()],
+    )
+
+
+def gurus_from_file(session, infile) -> list[guru_m.Guru]:
+    """Add gurus from a file to the database
 
     Returns:
-        bool: True if one string is in the other
+        list: List of newly added gurus
     """
-    ob_low = getattr(obj, obj_var).lower()
-    return ob_low in compare_val.lower() or compare_val.lower() in ob_low
-
-
-def gurus_from_file(session, infile):
-    """Add gurus from a file to the database"""
     with open(infile) as f:
         guru_names = f.read().split(',')
     session_gurus = session.exec(sqm.select(guru_m.Guru.name)).all()
+    gurus = []
     if new_gurus := set(guru_names) - set(session_gurus):
         logger.info(f'Adding {len(new_gurus)} new gurus')
         gurus = [guru_m.Guru(name=_) for _ in new_gurus]
         session.add_all(gurus)
         session.commit()
-
-
-# @lru_cache
-# def model_map_():
-#     return {suppawt.convert.snake_name(_): _ for _ in ALL_MODELS}
-
-# @ps.quiet_cancel_try_log_as
-# async def init_eps(session, episode_stream: AsyncGenerator[scrapaw.DTGEpisode, None]):
-#     init_n = 1
-#     init_i = 0
-#     logger.info("Initialising episodes")
-#     eps = []
-#     async for ep in episode_stream:
-#         ep = episode_m.DTGEpisodeDB.model_validate(ep)
-#         eps.append(ep)
-#         init_i += 1
-#         if init_i >= init_n:
-#             break
-#
-#     # eps = [Episode.model_validate(_) async for _ in episode_stream]
-#     eps = sorted(eps, key=lambda _: _.date)
-#     for ep in eps:
-#         if sqlpr.obj_in_session(session, ep):
-#             continue
-#         logger.info(f"Adding {ep.title}")
-#         session.add(ep)
-#         thread_matches = db_obj_matches(session, ep, reddit_m.RedditThread)
-#         guru_matches = db_obj_matches(session, ep, guru_m.Guru)
-#         sqlpr.assign_rel(ep, reddit_m.RedditThread, thread_matches)
-#         sqlpr.assign_rel(ep, guru_m.Guru, guru_matches)
-#     if session.new:
-#         session.commit()
+    return gurus
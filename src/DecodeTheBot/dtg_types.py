@@ -1,8 +1,10 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
-from typing import Sequence, TypeVar, Union
+from typing import TypeVar, Union
 
-from sqlmodel import SQLModel
 import pydantic as _p
+from pydantic import alias_generators
+from sqlmodel import SQLModel
 
 from DecodeTheBot.models import episode_m, guru_m, links, reddit_m, responses
 
@@ -11,7 +13,21 @@ LINK_MODELS = (links.GuruEpisodeLink, links.RedditThreadEpisodeLink, links.Reddi
 ALL_MODELS = (*DB_MODELS, *LINK_MODELS)
 ALL_MODELS_TYPE = Union[ALL_MODELS]
 DB_MODEL_TYPE = Union[DB_MODELS]
-DB_MODEL_VAR = TypeVar("DB_MODEL_VAR", bound=DB_MODEL_TYPE)
+DB_MODEL_VAR = TypeVar('DB_MODEL_VAR', bound=DB_MODEL_TYPE)
+
+
+def link_field(model: type[SQLModel]) -> str:
+    """Name of the foreign key field pointing at model in link models"""
+    return alias_generators.to_snake(model.__name__) + '_id'
+
+
+def link_model(model: type[SQLModel], other: type[SQLModel]) -> type[SQLModel]:
+    """Get the link model joining two db models"""
+    fields = {link_field(model), link_field(other)}
+    for link in LINK_MODELS:
+        if fields <= set(link.model_fields):
+            return link
+    raise ValueError(f'No link model for {model.__name__} and {other.__name__}')
 
 
 @dataclass
@@ -26,21 +42,21 @@ GuruMap = ModelMap(
     base=guru_m.GuruBase,
     db_model=guru_m.Guru,
     model_links=[links.GuruEpisodeLink, links.RedditThreadGuruLink],
-    output=responses.GuruOut
+    output=responses.GuruOut,
 )
 
 EpisodeMap = ModelMap(
     base=episode_m.EpisodeBase,
     db_model=episode_m.Episode,
     model_links=[links.GuruEpisodeLink, links.RedditThreadEpisodeLink],
-    output=responses.EpisodeOut
+    output=responses.EpisodeOut,
 )
 
 RedditThreadMap = ModelMap(
     base=reddit_m.RedditThreadBase,
     db_model=reddit_m.RedditThread,
     model_links=[links.RedditThreadEpisodeLink, links.RedditThreadGuruLink],
-    output=responses.RedditThreadOut
+    output=responses.RedditThreadOut,
 )
 
 models_map = {
@@ -2,17 +2,21 @@ import functools
 import os
 from pathlib import Path
 
+from loguru import logger
 from pydantic import HttpUrl, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from suppawt.pawlogger import get_loguru
 
 GURU_ENV = os.getenv('GURU_ENV')
 REDDIT_ENV = os.getenv('REDDIT_ENV')
-print(GURU_ENV, REDDIT_ENV)
-if not GURU_ENV or not Path(GURU_ENV).exists():
-    raise ValueError('GURU_ENV (path to environment file) not set')
-if not REDDIT_ENV or not Path(REDDIT_ENV).exists():
-    raise ValueError('REDDIT_ENV (path to environment file) not set')
+
+
+def env_file(name: str) -> Path:
+    """Path of the environment file named by env var name, checked when settings are first loaded not at import"""
+    path = os.getenv(name)
+    if not path or not Path(path).exists():
+        raise ValueError(f'{name} (path to environment file) not set')
+    return Path(path)
 
 
 class RedditConfig(BaseSettings):
@@ -39,18 +43,27 @@ class GuruConfig(BaseSettings):
     log_file: Path
     podcast_url: HttpUrl
     backup_shelf: Path | None = None
+    http_cache_file: Path | None = None
 
     @model_validator(mode='after')
-    def backup_shelf(self):
+    def default_backup_shelf(self):
         if self.backup_shelf is None:
             self.backup_shelf = Path(self.backup_dir / 'dtg_bot.shelf')
         return self
 
+    @model_validator(mode='after')
+    def default_http_cache_file(self):
+        if self.http_cache_file is None:
+            self.http_cache_file = self.guru_db.with_name('http_cache.sqlite')
+        return self
+
     page_size: int = 20
 
     backup_sleep: int = 60 * 60 * 24
     scraper_sleep: int = 60 * 10
     reddit_sleep: int = 60 * 10
+    poll_min_sleep: int = 60
+    poll_max_sleep: int = 60 * 60
 
     init_eps: bool = False
     restore_from_shelf: bool = False
@@ -58,6 +71,55 @@ class GuruConfig(BaseSettings):
     debug: bool = False
     trim_db: bool = False
     episode_scrape_limit: int | None = None
+    reddit_fetch_limit: int = 100
+    # submission attributes kept in redditthread.submission, as a JSON list, null keeps them all
+    submission_fields: tuple[str, ...] | None = (
+        'id',
+        'name',
+        'author_fullname',
+        'permalink',
+        'url',
+        'domain',
+        'selftext',
+        'link_flair_text',
+        'created_utc',
+        'score',
+        'upvote_ratio',
+        'num_comments',
+        'is_self',
+        'over_18',
+    )
+    # also keep every attribute, zlib compressed, in redditthread.submission_raw
+    keep_raw_submission: bool = False
+
+    # podcast site connection pool, seconds for timeouts
+    http_connections: int = 8
+    http_keepalive: float = 60
+    http_connect_timeout: float = 10
+    http_read_timeout: float = 30
+    http_total_timeout: float = 120
+    # page bodies kept in the scraper's http cache, 0 disables it
+    http_cache_bytes: int = 64 * 1024 * 1024
+
+    episode_q_maxsize: int = 100
+    reddit_q_maxsize: int = 500
+
+    process_batch_size: int = 50
+    process_batch_window: float = 2.0
+    # seconds allowed at shutdown to commit what is queued, the rest is requeued on the next start
+    drain_timeout: float = 30
+
+    sqlite_journal_mode: str = 'wal'
+    sqlite_synchronous: str = 'normal'
+    sqlite_cache_size: int = -64_000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_busy_timeout: int = 5_000
+    sqlite_temp_store: str = 'memory'
+
+    fragment_cache_bytes: int = 32 * 1024 * 1024
+
+    embed_bot: bool = True
+    lease_ttl: int = 60
 
     model_config = SettingsConfigDict(env_ignore_empty=True, env_file=GURU_ENV)
 
@@ -71,19 +133,21 @@ logger_dict = {
 
 @functools.lru_cache
 def guru_settings():
-    cf = GuruConfig()
+    guru_env = env_file('GURU_ENV')
+    cf = GuruConfig(_env_file=guru_env)
     logger = get_loguru(cf.log_file, 'local', category_dict=logger_dict)
-    logger.info(f'GuruConfig loaded from {GURU_ENV}')
-    logger.info(f'RedditConfig loaded from {REDDIT_ENV}')
+    logger.info(f'GuruConfig loaded from {guru_env}')
     return cf
 
 
 @functools.lru_cache
 def reddit_settings():
-    return RedditConfig()
+    reddit_env = env_file('REDDIT_ENV')
+    cf = RedditConfig(_env_file=reddit_env)
+    logger.info(f'RedditConfig loaded from {reddit_env}')
+    return cf
 
 
 if __name__ == '__main__':
     gs = guru_settings()
     rs = reddit_settings()
-    ...
@@ -1,22 +1,28 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
-from sqlmodel import Field, Relationship
-import sqlmodel as sqm
+import pydantic as _p
 import sqlalchemy as sqa
-
+import sqlmodel as sqm
 from scrapaw import EpisodeBase
-from suppawt import get_values
+from sqlmodel import Field, Relationship
+
+from DecodeTheBot.core.dedupe import content_hash, with_content_hash
+
 from .links import GuruEpisodeLink, RedditThreadEpisodeLink
 
 if TYPE_CHECKING:
     from DecodeTheBot.models.guru_m import Guru
+
     from .reddit_m import RedditThread
 
 
 class Episode(EpisodeBase, sqm.SQLModel, table=True):
+    __table_args__ = (sqa.Index('ix_episode_date_id', 'date', 'id'),)
+
     links: dict[str, str] = Field(default_factory=dict, sa_column=sqm.Column(sqa.JSON))
     notes: list[str] = Field(default_factory=list, sa_column=sqm.Column(sqa.JSON))
     id: int | None = Field(default=None, primary_key=True)
+    content_hash: str | None = Field(default=None, index=True, unique=True)
     gurus: list['Guru'] = Relationship(back_populates='episodes', link_model=GuruEpisodeLink)
     reddit_threads: list['RedditThread'] = Relationship(back_populates='episodes', link_model=RedditThreadEpisodeLink)
 
@@ -24,9 +30,16 @@ class Episode(EpisodeBase, sqm.SQLModel, table=True):
     def slug(self):
         return f'/eps/{self.id}'
 
+    hash_fields: ClassVar[tuple[str, ...]] = ('title', 'date')
+
+    @_p.model_validator(mode='before')
+    @classmethod
+    def set_content_hash(cls, data):
+        return with_content_hash(cls, data)
+
     @property
     def get_hash(self):
-        return get_values.hash_simple_md5([self.title, str(self.date)])
+        return self.content_hash or content_hash(self.title, self.date)
 
     @classmethod
     def rout_prefix(cls):
@@ -4,13 +4,13 @@
 E           sqlalchemy.exc.InvalidRequestError: When initializing mapper Mapper[Guru(guru)], expression "relationship("List['Episode']")" seems to be using a generic class as the argument to relationship(); please state the generic argument using an annotation, e.g. "episodes: Mapped[List['Episode']] = relationship()"
 
 """
+
 from functools import cached_property
-from typing import ClassVar, TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
+import sqlalchemy as sa
 import sqlmodel
-from pydantic import computed_field
 from sqlmodel import Field, Relationship, SQLModel
-import sqlalchemy as sa
 
 from .links import GuruEpisodeLink, RedditThreadGuruLink
 
@@ -25,9 +25,16 @@ class GuruBase(SQLModel):
 
 
 class Guru(GuruBase, table=True):
+    __table_args__ = (sa.Index('ix_guru_interest_id', 'interest', 'id'),)
+
     id: int | None = Field(default=None, primary_key=True)
     notes: list[str] | None = Field(default_factory=list, sa_column=sqlmodel.Column(sa.JSON))
 
+    # link counts, maintained by the bot as it inserts links; interest = episode_count + thread_count
+    episode_count: int = 0
+    thread_count: int = 0
+    interest: int = 0
+
     episodes: list['Episode'] = Relationship(back_populates='gurus', link_model=GuruEpisodeLink)
 
     reddit_threads: list['RedditThread'] = Relationship(back_populates='gurus', link_model=RedditThreadGuruLink)
@@ -37,7 +44,3 @@ class Guru(GuruBase, table=True):
     @cached_property
     def slug(self):
         return f'/{self.__class__.rout_prefix}/{self.id}'
-
-    @computed_field
-    def interest(self) -> int:
-        return len(self.episodes) + len(self.reddit_threads)
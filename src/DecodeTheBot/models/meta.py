@@ -0,0 +1,56 @@
+from datetime import UTC, datetime
+
+from sqlalchemy import Column, LargeBinary
+from sqlmodel import Field, SQLModel
+
+
+def utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class DBMeta(SQLModel, table=True):
+    """Single row tracking when the bot last changed the data
+
+    data_version increments on every bot commit, so readers can tell whether anything changed.
+    """
+
+    id: int | None = Field(default=None, primary_key=True)
+    data_version: int = 0
+    updated: datetime = Field(default_factory=utcnow)
+
+
+class WorkerLease(SQLModel, table=True):
+    """Single row naming the one process allowed to run the bot and write to the database
+
+    The holder renews heartbeat while it runs. A lease whose heartbeat is older than its ttl may be taken over.
+    """
+
+    id: int | None = Field(default=None, primary_key=True)
+    holder: str = ''
+    acquired: datetime = Field(default_factory=utcnow)
+    heartbeat: datetime = Field(default_factory=utcnow)
+
+
+class Watermark(SQLModel, table=True):
+    """Newest item the bot has committed from a source, where the next fetch can stop
+
+    position is the item's publication time, key identifies the item itself.
+    """
+
+    source: str = Field(primary_key=True)
+    position: datetime
+    key: str
+    updated: datetime = Field(default_factory=utcnow)
+
+
+class QueuedItem(SQLModel, table=True):
+    """An item the bot has fetched and queued but not yet committed
+
+    Rows are written before the item is queued in memory and deleted in the transaction that commits it,
+    so items still queued when the bot stops are queued again on the next start.
+    """
+
+    id: int | None = Field(default=None, primary_key=True)
+    queue: str = Field(index=True)
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    enqueued: datetime = Field(default_factory=utcnow)
@@ -1,26 +1,41 @@
 # no dont do this!! from __future__ import annotations
+import json
+import zlib
+from collections.abc import Collection
 from datetime import datetime
-from typing import Dict, List, Optional, TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
-from asyncpraw.models import Submission
-from fastui import components as c
-from suppawt import get_values
 import pydantic as _p
 import sqlalchemy as sqa
 import sqlmodel as sqm
+from sqlalchemy.orm import defer
 
+from DecodeTheBot.core.dedupe import content_hash, with_content_hash
 from DecodeTheBot.models.links import RedditThreadEpisodeLink, RedditThreadGuruLink
 
 if TYPE_CHECKING:
+    from asyncpraw.models import Submission
+
     from DecodeTheBot.models.episode_m import Episode
     from DecodeTheBot.models.guru_m import Guru
 
 
-def submission_to_dict(submission: Submission):
+def submission_to_dict(submission: 'Submission | dict', fields: Collection[str] | None = None):
+    """JSON-serialisable attributes of a submission, only those named in fields if given"""
     serializable_types = (int, float, str, bool, type(None))
-    if isinstance(submission, Submission):
+    if not isinstance(submission, dict):
         submission = vars(submission)
-    return {k: v for k, v in submission.items() if isinstance(v, serializable_types)}
+    return {
+        k: v for k, v in submission.items() if isinstance(v, serializable_types) and (fields is None or k in fields)
+    }
+
+
+def compress_submission(submission: dict) -> bytes:
+    return zlib.compress(json.dumps(submission, separators=(',', ':')).encode())
+
+
+def decompress_submission(raw: bytes) -> dict:
+    return json.loads(zlib.decompress(raw))
 
 
 class RedditThreadBase(sqm.SQLModel):
@@ -28,45 +43,72 @@ class RedditThreadBase(sqm.SQLModel):
     title: str
     shortlink: str
     created_datetime: datetime
-    submission: Dict = sqm.Field(default=None, sa_column=sqa.Column(sqa.JSON))
+    submission: dict = sqm.Field(default=None, sa_column=sqa.Column(sqa.JSON))
+    submission_raw: bytes | None = sqm.Field(default=None, sa_column=sqa.Column(sqa.LargeBinary))
 
-    @_p.field_validator("submission", mode="before")
+    @_p.field_validator('submission', mode='before')
     def validate_submission(cls, v):
         return submission_to_dict(v)
 
     @classmethod
-    def from_submission(cls, submission: Submission):
+    def from_submission(cls, submission: 'Submission', fields: Collection[str] | None = None, keep_raw: bool = False):
+        """Thread from a submission, keeping the attributes named in fields (all if None)
+
+        With keep_raw every attribute is also stored, compressed, in submission_raw.
+        """
+        scalars = submission_to_dict(submission)
         tdict = dict(
             reddit_id=submission.id,
             title=submission.title,
             shortlink=submission.shortlink,
             created_datetime=submission.created_utc,
-            submission=submission,
+            submission=submission_to_dict(scalars, fields),
+            submission_raw=compress_submission(scalars) if keep_raw else None,
         )
         return cls.model_validate(tdict)
 
+    @property
+    def raw_submission(self) -> dict | None:
+        return decompress_submission(self.submission_raw) if self.submission_raw is not None else None
+
 
 class RedditThread(RedditThreadBase, table=True, extend_existing=True):
-    id: Optional[int] = sqm.Field(default=None, primary_key=True)
+    __table_args__ = (sqa.Index('ix_redditthread_created_datetime', 'created_datetime'),)
 
-    gurus: List["Guru"] = sqm.Relationship(
-        back_populates="reddit_threads", link_model=RedditThreadGuruLink
-    )
-    episodes: List["Episode"] = sqm.Relationship(
-        back_populates="reddit_threads", link_model=RedditThreadEpisodeLink
-    )
+    id: int | None = sqm.Field(default=None, primary_key=True)
+    content_hash: str | None = sqm.Field(default=None, index=True, unique=True)
+
+    gurus: list['Guru'] = sqm.Relationship(back_populates='reddit_threads', link_model=RedditThreadGuruLink)
+    episodes: list['Episode'] = sqm.Relationship(back_populates='reddit_threads', link_model=RedditThreadEpisodeLink)
+
+    hash_fields: ClassVar[tuple[str, ...]] = ('reddit_id',)
+
+    @_p.model_validator(mode='before')
+    @classmethod
+    def set_content_hash(cls, data):
+        return with_content_hash(cls, data)
 
     @property
     def get_hash(self):
-        return get_values.hash_simple_md5([self.reddit_id])
+        return self.content_hash or content_hash(self.reddit_id)
 
     @property
     def slug(self):
-        return f"/red/{self.id}"
+        return f'/red/{self.id}'
 
     def ui_detail(self):
+        from fastui import components as c
+
         return c.Details(data=self)
 
     @classmethod
     def rout_prefix(cls):
-        return "/red/"
+        return '/red/'
+
+
+def payload_defers() -> tuple:
+    """Loader options leaving the submission payloads, never shown in listings, in the database until asked for
+
+    Built on call, as loader options configure the mappers, which needs the related models imported.
+    """
+    return defer(RedditThread.submission), defer(RedditThread.submission_raw)
@@ -0,0 +1,136 @@
+"""Ingestion worker, the one process that scrapes, monitors reddit and writes the database
+
+Run `dtg-worker` alongside any number of web processes started with EMBED_BOT=false, which then only read.
+A lease row in the database guarantees a single writer, whether the bot runs here or embedded in the web app.
+"""
+
+import asyncio
+import shelve
+import signal
+from contextlib import asynccontextmanager
+
+import sqlmodel
+from loguru import logger
+
+from DecodeTheBot.core import database, search
+from DecodeTheBot.core.lease import LeaseHeld, WriterLease
+from DecodeTheBot.guru_config import GuruConfig, guru_settings
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+
+
+def db_from_shelf(session: sqlmodel.Session, settings: GuruConfig | None = None):
+    """Restore episodes and gurus from the backup shelf, skipping any already in the database"""
+    settings = settings or guru_settings()
+    with shelve.open(str(settings.backup_shelf)) as shelf:
+        episodes = shelf.get('episode')
+        gurus = shelf.get('guru')
+    episodes = sorted(episodes, key=lambda x: x.date, reverse=True)
+    gurus = sorted(gurus, key=lambda x: x.id)
+    episodes = [Episode.model_validate(_.model_dump(exclude={'gurus', 'reddit_threads'})) for _ in episodes]
+    gurus = [Guru.model_validate(_.model_dump(exclude={'episodes', 'reddit_threads'})) for _ in gurus]
+    restored = database.insert_new(session, Episode, episodes)
+    restored_gurus = database.insert_new(session, Guru, gurus, key='name')
+    session.commit()
+    logger.info(f'Restored {len(restored)}/{len(episodes)} episodes and {len(restored_gurus)}/{len(gurus)} gurus')
+
+
+def prepare_db(settings: GuruConfig):
+    database.create_db()
+    with sqlmodel.Session(database.engine_()) as session:
+        if settings.restore_from_shelf:
+            db_from_shelf(session, settings)
+        if settings.trim_db:
+            database.trim_db(session)
+        if settings.restore_from_shelf or settings.trim_db:
+            database.recount_interest(session)
+        if settings.submission_fields is not None:
+            database.compact_submissions(session, settings.submission_fields)
+        if not search.in_sync(session):
+            logger.info('Rebuilding search index')
+            search.rebuild(session)
+        database.bump_data_version(session)
+        session.commit()
+    logger.info('tables created')
+
+
+async def shelf_db():
+    await database.run_write(_shelf_db)
+
+
+def _shelf_db():
+    from DecodeTheBot import dtg_types
+
+    g_sett = guru_settings()
+    with sqlmodel.Session(database.engine_()) as session, shelve.open(g_sett.backup_shelf) as shelf:
+        for model_name, mapping in dtg_types.models_map.items():
+            result = session.exec(sqlmodel.select(mapping.db_model))
+            outputs = [mapping.output.model_validate(_, from_attributes=True) for _ in result.all()]
+            shelf[model_name] = outputs
+    logger.info(f'DB shelved to {g_sett.backup_shelf}')
+
+
+@asynccontextmanager
+async def running_bot(settings: GuruConfig):
+    """Take the writer lease, prepare the database and run the bot until the context exits
+
+    Yields the bot, and the task renewing the lease which fails with LeaseLost if another process takes it over.
+
+    Raises:
+        LeaseHeld: If another live process holds the lease
+    """
+    # the bot pulls in asyncpraw, aiohttp and scrapaw, so import it only when it runs
+    from DecodeTheBot.dtg_bot import DTG
+
+    lease = WriterLease(database.engine_(), settings.lease_ttl)
+    if not await database.run_write(lease.acquire):
+        raise LeaseHeld(f'Writer lease held by {await database.run_write(lease.current_holder)}')
+    logger.info(f'Writer lease acquired by {lease.holder}')
+    # renew from the start, preparing the database can outlast the ttl
+    keeper = asyncio.create_task(lease.keep())
+    try:
+        await database.run_write(prepare_db, settings)
+        if keeper.done():
+            keeper.result()
+        # noinspection PyArgumentList
+        async with DTG(guru_settings=settings) as dtg:
+            main_task = asyncio.create_task(dtg.run())
+            stopping = []
+
+            def stop_writing(task: asyncio.Task):
+                # a lost lease means another writer has taken over, so stop the bot at once, without draining
+                if not task.cancelled():
+                    stopping.append(asyncio.create_task(dtg.kill(drain_timeout=0)))
+
+            keeper.add_done_callback(stop_writing)
+            try:
+                yield dtg, keeper
+            finally:
+                keeper.cancel()
+                main_task.cancel()
+                await asyncio.gather(main_task, return_exceptions=True)
+                await dtg.kill()
+                await shelf_db()
+    finally:
+        keeper.cancel()
+        await asyncio.gather(keeper, return_exceptions=True)
+        await database.run_write(lease.release)
+        logger.info(f'Writer lease released by {lease.holder}')
+
+
+async def run_worker(settings: GuruConfig):
+    """Run the bot until cancelled or SIGTERM, or until the writer lease is lost"""
+    async with running_bot(settings) as (_, keeper):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, keeper.cancel)
+        try:
+            await keeper
+        except asyncio.CancelledError:
+            logger.info('Worker stopping')
+
+
+def main():
+    asyncio.run(run_worker(guru_settings()))
+
+
+if __name__ == '__main__':
+    main()
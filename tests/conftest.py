@@ -5,12 +5,15 @@
 #
 # import pytest
 # from asyncpraw import Reddit
+import contextlib
+import datetime as dt
 import inspect
 import re
+from pathlib import Path
 from random import randint
+from types import SimpleNamespace
 
 import pytest
-from loguru import logger as _logger
 
 # from sqlalchemy import create_engine
 # from sqlalchemy.pool import StaticPool
@@ -26,18 +29,31 @@ from loguru import logger as _logger
 # from main import app
 #
 from asyncpraw import Reddit
+from fastapi import FastAPI
+from loguru import logger as _logger
+from sqlalchemy import StaticPool, create_engine, event
+from sqlmodel import Session, SQLModel
+from starlette.staticfiles import StaticFiles
 from suppawt.pawlogger.config_loguru import get_loguru
-from sqlalchemy import StaticPool, create_engine
-from sqlmodel import SQLModel, Session
 
+from DecodeTheBot.core import database
+from DecodeTheBot.core.dedupe import HashIndex
+from DecodeTheBot.core.matcher import Matcher
+from DecodeTheBot.dtb_htmx import cache, typeahead_route
+from DecodeTheBot.dtb_htmx.cache import FragmentCache
+from DecodeTheBot.dtg_bot import DTG, gurus_from_file
 from DecodeTheBot.guru_config import GuruConfig, RedditConfig
 from DecodeTheBot.models.episode_m import Episode
-from DecodeTheBot.dtg_bot import gurus_from_file
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.reddit_m import RedditThread
+
+STATIC_DIR = Path(database.__file__).parents[1] / 'ui/static'
 
 # from src.DecodeTheBot.models.guru import Guru  # F401
 # from src.DecodeTheBot.models.reddit_ext import RedditThread  # F401
 
 TEST_DB = 'sqlite://'
+SUBMISSIONS_START = dt.datetime(2024, 1, 1, tzinfo=dt.UTC)
 ENGINE = create_engine(
     TEST_DB,
     connect_args={'check_same_thread': False},
@@ -45,6 +61,131 @@ ENGINE = create_engine(
 )
 
 
+def memory_engine():
+    """A fresh in-memory database with all tables created"""
+    engine = create_engine(TEST_DB, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    database.create_db(engine)
+    return engine
+
+
+@contextlib.contextmanager
+def count_queries(engine):
+    """Collect the SQL statements run on engine inside the block"""
+    queries = []
+
+    def on_execute(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+
+
+@pytest.fixture(autouse=True)
+def fresh_fragment_cache(monkeypatch):
+    """Each test's databases start at data version 0, so never share rendered fragments between tests"""
+    fragments = FragmentCache(max_bytes=1024 * 1024)
+    monkeypatch.setattr(cache, 'fragment_cache', lambda: fragments)
+    return fragments
+
+
+@pytest.fixture(autouse=True)
+def fresh_typeahead(monkeypatch):
+    """Likewise the typeahead index, which refreshes by data version"""
+    typeahead = typeahead_route.Typeahead()
+    monkeypatch.setattr(typeahead_route, 'typeahead_index', lambda: typeahead)
+    return typeahead
+
+
+def fake_episode_dict(i: int) -> dict:
+    return dict(
+        title=f'Synthetic Episode {i}',
+        url=f'https://example.com/episode/{i}',
+        date=dt.date(2000, 1, 1) + dt.timedelta(days=i),
+        notes=[f'note for episode {i}'],
+        links={f'link {i}': f'https://example.com/link/{i}'},
+        number=str(i),
+    )
+
+
+def fake_thread_dict(i: int) -> dict:
+    return dict(
+        reddit_id=f't{i:07x}',
+        title=f'Synthetic Thread {i}',
+        shortlink=f'https://redd.it/t{i:07x}',
+        created_datetime=dt.datetime(2020, 1, 1) + dt.timedelta(minutes=i),
+        submission={'id': f't{i:07x}'},
+    )
+
+
+def submission(i: int) -> SimpleNamespace:
+    """Stand-in for an asyncpraw submission, a minute newer per i"""
+    return SimpleNamespace(
+        id=f's{i:06}',
+        title=f'Submission {i}',
+        shortlink=f'https://redd.it/s{i:06}',
+        created_utc=(SUBMISSIONS_START + dt.timedelta(minutes=i)).timestamp(),
+    )
+
+
+class FakeSubreddit:
+    """Lists submissions 0..n newest first, counting how many the caller pulled"""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.pulled = 0
+
+    async def new(self, limit: int):
+        for i in range(self.n - 1, max(self.n - 1 - limit, -1), -1):
+            self.pulled += 1
+            yield submission(i)
+
+
+def populate(session: Session, n_episodes: int = 0, n_threads: int = 0):
+    """Bulk insert synthetic episodes and threads"""
+    session.add_all(Episode.model_validate(fake_episode_dict(i)) for i in range(n_episodes))
+    session.add_all(RedditThread.model_validate(fake_thread_dict(i)) for i in range(n_threads))
+    session.commit()
+
+
+def make_web_app(engine) -> FastAPI:
+    """App serving the htmx routers from engine"""
+    from DecodeTheBot.dtb_htmx.episode_route import router as ep_router
+    from DecodeTheBot.dtb_htmx.guru_route import router as guru_router
+    from DecodeTheBot.dtb_htmx.typeahead_route import router as typeahead_router
+
+    async def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app = FastAPI()
+    app.mount('/static', StaticFiles(directory=STATIC_DIR), name='static')
+    app.include_router(ep_router, prefix='/eps')
+    app.include_router(guru_router, prefix='/guru')
+    app.include_router(typeahead_router, prefix='/typeahead')
+    app.dependency_overrides[database.get_session] = override_get_session
+    return app
+
+
+def offline_bot(**guru_settings) -> DTG:
+    """A DTG that never touches the network, configured without env files"""
+    return DTG(
+        guru_settings=GuruConfig.model_construct(podcast_url='https://example.com', **guru_settings),
+        reddit_settings=RedditConfig.model_construct(),
+    )
+
+
+def batch_bot(session: Session) -> DTG:
+    """An offline DTG committing batches to session's database, with empty dedupe and matcher state"""
+    bot = offline_bot()
+    bot.engine = session.get_bind()
+    bot.hash_index = {Episode: HashIndex()}
+    bot.matchers = {model: Matcher.from_session(session, model) for model in (Episode, RedditThread, Guru)}
+    return bot
+
+
 @pytest.fixture
 def guru_settings():
     return GuruConfig()
@@ -86,16 +227,12 @@ def override_session():
         session.close()
 
 
-#
-#
 def override_logger():
     logger = _logger
     logger.remove()
     return logger
 
 
-#
-
 # client = TestClient(app)
 #
 # app.dependency_overrides[get_logger] = override_logger
@@ -140,7 +277,6 @@ def all_episodes_shelf(guru_settings):
         return f
 
 
-#
 @pytest.fixture(scope='function')
 def random_episode(all_episodes_shelf):
     res = all_episodes_shelf[randint(0, len(all_episodes_shelf) - 1)]
@@ -178,8 +314,6 @@ def test_db():
     # Episode.metadata.drop_all(bind=ENGINE)
 
 
-#
-#
 @pytest.fixture(scope='function')
 def blank_test_db(test_db):
     Episode.metadata.drop_all(bind=ENGINE)
@@ -189,8 +323,6 @@ def blank_test_db(test_db):
     yield
 
 
-#
-#
 @pytest.fixture(scope='module')
 def markup_sample():
     return """# Interview with Daniël Lakens and Smriti Mehta on the state of Psychology
@@ -0,0 +1,37 @@
+from sqlmodel import Session, select
+
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.links import GuruEpisodeLink
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import batch_bot, fake_episode_dict, memory_engine
+
+
+def test_commit_batch_inserts_items_and_links():
+    with Session(memory_engine()) as session:
+        session.add(Guru(name='Synthetic Episode 1'))
+        session.commit()
+        bot = batch_bot(session)
+        batch = [Episode.model_validate(fake_episode_dict(i)) for i in range(1, 4)]
+
+        committed = bot.commit_batch(batch, Episode, relation_classes=[RedditThread, Guru])
+
+        assert len(committed) == 3
+        assert len(session.exec(select(Episode)).all()) == 3
+        links = session.exec(select(GuruEpisodeLink)).all()
+        assert [(_.guru_id, _.episode_id) for _ in links] == [(1, 1)]
+        assert all(_.get_hash in bot.hash_index[Episode] for _ in committed)
+
+
+def test_commit_batch_isolates_bad_rows():
+    with Session(memory_engine()) as session:
+        bot = batch_bot(session)
+        bot.commit_batch([Episode.model_validate(fake_episode_dict(0))], Episode, relation_classes=[])
+
+        clash = Episode.model_validate(fake_episode_dict(1))
+        clash.id = 1
+        batch = [clash, Episode.model_validate(fake_episode_dict(2))]
+        committed = bot.commit_batch(batch, Episode, relation_classes=[])
+
+        assert [_.title for _ in committed] == ['Synthetic Episode 2']
+        assert len(session.exec(select(Episode)).all()) == 2
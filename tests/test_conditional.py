@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from DecodeTheBot.core import database
+from DecodeTheBot.dtb_htmx import conditional, episode_route, guru_route, templating
+from DecodeTheBot.guru_config import GuruConfig
+from tests.conftest import make_web_app, memory_engine, populate
+
+
+@pytest.fixture
+def engine_client(monkeypatch):
+    for module in (episode_route, guru_route):
+        monkeypatch.setattr(module, 'guru_settings', lambda: GuruConfig.model_construct(page_size=10))
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=5)
+        database.bump_data_version(session)
+        session.commit()
+    return engine, TestClient(make_web_app(engine))
+
+
+@pytest.mark.parametrize('url', ['/eps/', '/eps/get_eps/', '/eps/1/', '/guru/', '/guru/get_gurus/'])
+def test_etag_round_trip(engine_client, url):
+    engine, client = engine_client
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert all('dbmeta' in _ for _ in statements)
+
+
+def test_if_modified_since_not_trusted(engine_client):
+    engine, client = engine_client
+    last_modified = client.get('/eps/get_eps/').headers['last-modified']
+    # a commit within the same second would leave Last-Modified unchanged, so it can't answer 304
+    with Session(engine) as session:
+        database.bump_data_version(session)
+        session.commit()
+    assert client.get('/eps/get_eps/', headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_bot_commit_invalidates(engine_client):
+    engine, client = engine_client
+    etag = client.get('/eps/get_eps/').headers['etag']
+    with Session(engine) as session:
+        database.bump_data_version(session)
+        session.commit()
+    response = client.get('/eps/get_eps/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+
+
+def test_deploy_invalidates(engine_client, monkeypatch):
+    _, client = engine_client
+    etag = client.get('/eps/get_eps/').headers['etag']
+    monkeypatch.setattr(conditional, 'build_token', lambda: 'next-release')
+    response = client.get('/eps/get_eps/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+
+
+def test_build_token_follows_templates(tmp_path, monkeypatch):
+    monkeypatch.setattr(templating, 'TEMPLATE_DIR', tmp_path)
+    (tmp_path / 'card.html').write_text('<div>{{ title }}</div>')
+    conditional.build_token.cache_clear()
+    try:
+        token = conditional.build_token()
+        (tmp_path / 'card.html').write_text('<article>{{ title }}</article>')
+        conditional.build_token.cache_clear()
+        assert conditional.build_token() != token
+    finally:
+        conditional.build_token.cache_clear()
+
+
+def test_search_posts_are_not_conditional(engine_client):
+    _, client = engine_client
+    etag = client.get('/eps/get_eps/').headers['etag']
+    response = client.post(
+        '/eps/get_eps/', data={'search_kind': 'title', 'search_str': 'synthetic'}, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200
@@ -0,0 +1,90 @@
+import sqlalchemy as sqa
+from sqlmodel import Session, select
+
+from DecodeTheBot.core import database
+from DecodeTheBot.core.dedupe import HashIndex
+from DecodeTheBot.core.matcher import Matcher
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import fake_episode_dict, fake_thread_dict, memory_engine, offline_bot
+
+
+def test_hash_set_on_validation():
+    episode = Episode.model_validate(fake_episode_dict(1))
+    thread = RedditThread.model_validate(fake_thread_dict(1))
+    assert episode.content_hash == episode.get_hash
+    assert thread.content_hash == thread.get_hash
+    assert episode.content_hash != Episode.model_validate(fake_episode_dict(2)).content_hash
+
+
+def test_hash_set_validating_objects_and_raw_values():
+    episode = Episode.model_validate(fake_episode_dict(1))
+    assert Episode.model_validate(episode).content_hash == episode.content_hash
+    raw = fake_episode_dict(1) | {'date': fake_episode_dict(1)['date'].isoformat()}
+    assert Episode.model_validate(raw).content_hash == episode.content_hash
+
+
+def test_insert_new_hashes_constructed_items():
+    with Session(memory_engine()) as session:
+        # plain construction skips validation, so the hash is only filled on insert
+        episodes = [Episode(**fake_episode_dict(i)) for i in (1, 2, 2)]
+        assert episodes[0].content_hash is None
+        inserted = database.insert_new(session, Episode, episodes)
+        session.commit()
+
+        assert [_.title for _ in inserted] == ['Synthetic Episode 1', 'Synthetic Episode 2']
+        assert inserted[0].content_hash == Episode.model_validate(fake_episode_dict(1)).content_hash
+
+
+def test_insert_new_skips_stored_and_repeated():
+    with Session(memory_engine()) as session:
+        stored = database.insert_new(session, Episode, [Episode.model_validate(fake_episode_dict(i)) for i in range(3)])
+        session.commit()
+        assert [_.id for _ in stored] == [1, 2, 3]
+
+        batch = [Episode.model_validate(fake_episode_dict(i)) for i in (2, 3, 4, 4)]
+        inserted = database.insert_new(session, Episode, batch)
+        session.commit()
+
+        assert [_.title for _ in inserted] == ['Synthetic Episode 3', 'Synthetic Episode 4']
+        assert [_.id for _ in inserted] == [4, 5]
+        assert len(session.exec(select(Episode)).all()) == 5
+
+
+def test_commit_batch_lets_database_reject_duplicates():
+    with Session(memory_engine()) as session:
+        bot = offline_bot()
+        bot.engine = session.get_bind()
+        bot.hash_index = {Episode: HashIndex()}
+        bot.matchers = {model: Matcher.from_session(session, model) for model in (Episode, RedditThread, Guru)}
+        bot.commit_batch([Episode.model_validate(fake_episode_dict(1))], Episode, relation_classes=[])
+
+        # a duplicate that slipped past the in-memory index, eg written by another process
+        committed = bot.commit_batch(
+            [Episode.model_validate(fake_episode_dict(i)) for i in (1, 2)], Episode, relation_classes=[]
+        )
+
+        assert [_.title for _ in committed] == ['Synthetic Episode 2']
+        assert len(session.exec(select(Episode)).all()) == 2
+        assert bot.hash_index[Episode].pending == set()
+
+
+def test_backfill_hashes_older_rows():
+    engine = memory_engine()
+    rows = [fake_episode_dict(i) for i in (1, 2, 1)]
+    with engine.begin() as conn:
+        conn.execute(sqa.text('DROP INDEX ix_episode_content_hash'))
+        conn.execute(sqa.insert(Episode.__table__), rows)
+
+    database.backfill_content_hashes(engine)
+    database.create_missing_indexes(engine)
+
+    with Session(engine) as session:
+        hashes = session.exec(select(Episode.id, Episode.content_hash).order_by(Episode.id)).all()
+        assert hashes == [
+            (1, Episode.model_validate(rows[0]).get_hash),
+            (2, Episode.model_validate(rows[1]).get_hash),
+            (3, None),
+        ]
+        assert set(HashIndex.from_session(session, Episode).committed) == {hashes[0][1], hashes[1][1]}
@@ -0,0 +1,52 @@
+import pytest
+from sqlmodel import Session
+
+from DecodeTheBot import dtg_bot
+from DecodeTheBot.core.dedupe import HashIndex
+from DecodeTheBot.dtg_bot import DTG
+from DecodeTheBot.models.episode_m import Episode
+from tests.conftest import count_queries, fake_episode_dict, memory_engine, offline_bot, populate
+
+NEW_EPISODES = 500
+
+
+def test_hash_index_membership():
+    index = HashIndex(['a'])
+    assert 'a' in index
+    index.reserve('b')
+    assert 'b' in index
+    index.release('b')
+    assert 'b' not in index
+    index.commit('c')
+    assert 'c' in index
+    assert len(index) == 2
+
+
+def make_bot(stored: int) -> DTG:
+    bot = offline_bot(episode_q_maxsize=0)
+    bot.engine = memory_engine()
+    with Session(bot.engine) as session:
+        populate(session, n_episodes=stored)
+        bot.hash_index = {Episode: HashIndex.from_session(session, Episode)}
+    return bot
+
+
+async def ingest_statements(bot: DTG, monkeypatch) -> list[str]:
+    async def fake_blind(**kwargs):
+        for i in range(10**6, 10**6 + NEW_EPISODES):
+            yield fake_episode_dict(i)
+
+    monkeypatch.setattr(dtg_bot.dtg, 'get_episodes_blind', fake_blind)
+    with count_queries(bot.engine) as statements:
+        await bot.get_episodes()
+    assert bot.episode_q.qsize() == NEW_EPISODES
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_ingest_queries_independent_of_corpus_size(monkeypatch):
+    small = await ingest_statements(make_bot(1_000), monkeypatch)
+    large = await ingest_statements(make_bot(20_000), monkeypatch)
+    # dedupe is answered from the hash index, the only statements persist the queued items
+    assert len(small) == len(large) < NEW_EPISODES / 10
+    assert not [_ for _ in large if 'FROM episode' in _]
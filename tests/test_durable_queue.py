@@ -0,0 +1,146 @@
+import asyncio
+import pickle
+from contextlib import suppress
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from DecodeTheBot.core import database, durable, watermarks
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.meta import QueuedItem, utcnow
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import FakeSubreddit, fake_episode_dict, memory_engine, offline_bot, submission
+
+
+def restarted_bot(engine):
+    """A bot starting up on engine, as after __aenter__"""
+    bot = offline_bot(process_batch_window=0.01)
+    bot.engine = engine
+    bot.load_indexes()
+    return bot
+
+
+async def idle_poller():
+    with suppress(asyncio.CancelledError):
+        await asyncio.sleep(3600)
+
+
+def test_persist_pending_ack():
+    with Session(memory_engine()) as session:
+        thread = RedditThread.from_submission(submission(1), keep_raw=True)
+        episodes = [Episode.model_validate(fake_episode_dict(i)) for i in range(3)]
+        durable.persist(session, 'reddit', [thread])
+        entries = durable.persist(session, 'episode', episodes)
+
+        assert [_.item.model_dump() for _ in durable.pending(session, 'episode', Episode)] == [
+            _.model_dump() for _ in episodes
+        ]
+        assert durable.pending(session, 'reddit', RedditThread)[0].item.raw_submission == thread.raw_submission
+
+        durable.ack(session, [entries[0].id])
+        session.commit()
+        assert [_.item.title for _ in durable.pending(session, 'episode', Episode)] == [
+            'Synthetic Episode 1',
+            'Synthetic Episode 2',
+        ]
+
+
+def test_unreadable_items_dropped():
+    with Session(memory_engine()) as session:
+        durable.persist(session, 'episode', [Episode.model_validate(fake_episode_dict(1))])
+        session.add(QueuedItem(queue='episode', payload=b'not a pickle', enqueued=utcnow()))
+        session.add(QueuedItem(queue='episode', payload=pickle.dumps({'title': 'no date'}), enqueued=utcnow()))
+        session.commit()
+
+        assert [_.item.title for _ in durable.pending(session, 'episode', Episode)] == ['Synthetic Episode 1']
+        assert len(session.exec(select(QueuedItem)).all()) == 1
+
+
+@pytest.mark.asyncio
+async def test_restart_resumes_without_refetching():
+    engine = memory_engine()
+    bot = restarted_bot(engine)
+    bot.subreddit = FakeSubreddit(n=10)
+    await bot.get_reddit_threads()
+    # commit the oldest four, then stop with the rest still queued
+    entries = [bot.reddit_q.get_nowait() for _ in range(4)]
+    bot.commit_batch([_.item for _ in entries], RedditThread, [], acks=[_.id for _ in entries])
+
+    bot = restarted_bot(engine)
+    await bot.restore_queues()
+    restored = [bot.reddit_q.get_nowait().item for _ in range(bot.reddit_q.qsize())]
+    assert [_.title for _ in restored] == [f'Submission {i}' for i in range(4, 10)]
+    assert all(_.get_hash in bot.hash_index[RedditThread].pending for _ in restored)
+
+    bot.subreddit = FakeSubreddit(n=10)
+    await bot.get_reddit_threads()
+    assert bot.subreddit.pulled == 1
+    assert bot.reddit_q.empty()
+
+
+@pytest.mark.asyncio
+async def test_dropped_items_retried_after_restart(monkeypatch):
+    engine = memory_engine()
+    bot = restarted_bot(engine)
+    insert_new = database.insert_new
+
+    def locked_for_episode_1(session, model, items, key='content_hash'):
+        if any(_.title == 'Synthetic Episode 1' for _ in items):
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        return insert_new(session, model, items, key)
+
+    monkeypatch.setattr(database, 'insert_new', locked_for_episode_1)
+    # the second batch is newer than the item the first one dropped
+    for batch in (range(3), range(3, 6)):
+        episodes = [Episode.model_validate(fake_episode_dict(i)) for i in reversed(batch)]
+        await bot.queue_oldest_first(bot.episode_q, episodes)
+        entries = [bot.episode_q.get_nowait() for _ in range(bot.episode_q.qsize())]
+        bot.commit_batch([_.item for _ in entries], Episode, [], acks=[_.id for _ in entries])
+    monkeypatch.undo()
+
+    bot = restarted_bot(engine)
+    assert bot.watermarks[Episode].key == Episode.model_validate(fake_episode_dict(5)).get_hash
+    await bot.restore_queues()
+    entries = [bot.episode_q.get_nowait() for _ in range(bot.episode_q.qsize())]
+    assert [_.item.title for _ in entries] == ['Synthetic Episode 1']
+    bot.commit_batch([_.item for _ in entries], Episode, [], acks=[_.id for _ in entries])
+
+    with Session(engine) as session:
+        assert len(session.exec(select(Episode)).all()) == 6
+        assert session.exec(select(QueuedItem)).all() == []
+
+
+@pytest.mark.asyncio
+async def test_kill_drains_queues():
+    engine = memory_engine()
+    bot = restarted_bot(engine)
+    bot.tasks = [asyncio.create_task(bot.process_queue(bot.episode_q, Episode, [Guru], log_category='episode'))]
+    bot.pollers = [asyncio.create_task(idle_poller())]
+    bot.tasks.extend(bot.pollers)
+    await bot.queue_oldest_first(bot.episode_q, [Episode.model_validate(fake_episode_dict(i)) for i in range(20)])
+
+    await bot.kill(drain_timeout=5)
+
+    with Session(engine) as session:
+        assert len(session.exec(select(Episode)).all()) == 20
+        assert session.exec(select(QueuedItem)).all() == []
+
+
+@pytest.mark.asyncio
+async def test_kill_without_drain_keeps_queue():
+    engine = memory_engine()
+    bot = restarted_bot(engine)
+    bot.pollers = [asyncio.create_task(idle_poller())]
+    bot.tasks = list(bot.pollers)
+    await bot.queue_oldest_first(bot.episode_q, [Episode.model_validate(fake_episode_dict(i)) for i in range(3)])
+
+    await bot.kill(drain_timeout=0)
+
+    bot = restarted_bot(engine)
+    await bot.restore_queues()
+    assert bot.episode_q.qsize() == 3
+    assert bot.watermarks[Episode].key == Episode.model_validate(fake_episode_dict(2)).get_hash
+    with Session(engine) as session:
+        assert watermarks.load(session) == {}
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from DecodeTheBot.core import database
+from DecodeTheBot.dtb_htmx import cache, episode_route, guru_route
+from DecodeTheBot.dtb_htmx.cache import FragmentCache
+from DecodeTheBot.guru_config import GuruConfig
+from DecodeTheBot.models.episode_m import Episode
+from tests.conftest import fake_episode_dict, make_web_app, memory_engine, populate
+
+
+def test_lru_eviction_by_size():
+    cache = FragmentCache(max_bytes=10)
+    cache.put(('a', '', 1), b'12345')
+    cache.put(('b', '', 1), b'12345')
+    assert cache.get(('a', '', 1)) == b'12345'
+    cache.put(('c', '', 1), b'12345')
+    assert cache.get(('b', '', 1)) is None
+    assert cache.get(('a', '', 1)) == b'12345'
+    assert cache.size == 10
+
+
+def test_new_version_drops_old_entries():
+    cache = FragmentCache(max_bytes=100)
+    cache.put(('a', '', 1), b'old')
+    cache.put(('a', '', 2), b'new')
+    assert len(cache) == 1
+    cache.put(('a', '', 1), b'stale')
+    assert cache.get(('a', '', 1)) is None
+
+
+@pytest.fixture
+def engine_client(monkeypatch):
+    for module in (episode_route, guru_route):
+        monkeypatch.setattr(module, 'guru_settings', lambda: GuruConfig.model_construct(page_size=50))
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=30)
+    return engine, TestClient(make_web_app(engine))
+
+
+def test_cached_cards_stay_correct_across_bot_writes(engine_client, fresh_fragment_cache):
+    engine, client = engine_client
+    first = client.get('/eps/get_eps/').text
+    assert client.get('/eps/get_eps/').text == first
+    assert fresh_fragment_cache.hits == 1
+
+    with Session(engine) as session:
+        session.add(Episode.model_validate(fake_episode_dict(1000) | {'title': 'Brand New Episode'}))
+        database.bump_data_version(session)
+        session.commit()
+
+    assert 'Brand New Episode' in client.get('/eps/get_eps/').text
+    assert fresh_fragment_cache.hits == 1
+
+
+def test_hits_skip_rendering(engine_client, fresh_fragment_cache, monkeypatch):
+    engine, client = engine_client
+    renders = []
+
+    def counting_render(templates, request, name, load_context):
+        renders.append(name)
+        return render(templates, request, name, load_context)
+
+    render = cache.render
+    monkeypatch.setattr(cache, 'render', counting_render)
+
+    for _ in range(3):
+        client.get('/eps/get_eps/')
+    client.get('/eps/')
+    assert (len(renders), fresh_fragment_cache.hits, fresh_fragment_cache.misses) == (2, 2, 2)
+
+    with Session(engine) as session:
+        database.bump_data_version(session)
+        session.commit()
+    client.get('/eps/get_eps/')
+    assert (len(renders), fresh_fragment_cache.hits, fresh_fragment_cache.misses) == (3, 2, 3)
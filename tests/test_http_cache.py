@@ -0,0 +1,142 @@
+import aiohttp
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from DecodeTheBot.core.http_cache import CachedPage, CachingSession, HttpCache
+from DecodeTheBot.guru_config import GuruConfig
+
+PAGE_BYTES = 10_000
+
+
+class Site:
+    """Stand-in podcast site with ETags, counting full and not-modified responses"""
+
+    def __init__(self):
+        self.versions: dict[str, int] = {}
+        self.full = 0
+        self.not_modified = 0
+
+    def body(self, name: str) -> bytes:
+        return f'{name} v{self.versions.get(name, 0)} '.encode().ljust(PAGE_BYTES, b'.')
+
+    async def page(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+        etag = f'"{name}-{self.versions.get(name, 0)}"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        self.full += 1
+        return web.Response(body=self.body(name), content_type='text/html', charset='utf-8', headers={'ETag': etag})
+
+    async def plain(self, request: web.Request) -> web.Response:
+        self.full += 1
+        return web.Response(text='no validators')
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/page/{name}', self.page)
+        app.router.add_get('/plain', self.plain)
+        return app
+
+
+@pytest_asyncio.fixture
+async def site_session(tmp_path):
+    site = Site()
+    async with TestServer(site.app()) as server:
+        session = CachingSession(aiohttp.ClientSession(), HttpCache(tmp_path / 'cache.sqlite', 1024 * 1024))
+        yield site, server, session
+        await session.close()
+
+
+async def get_text(session, url) -> str:
+    async with session.get(url) as response:
+        assert response.status == 200
+        return await response.text()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_page_served_from_disk(site_session):
+    site, server, session = site_session
+    url = server.make_url('/page/a')
+
+    first = await get_text(session, url)
+    second = await get_text(session, url)
+    assert first == second == site.body('a').decode()
+    assert (site.full, site.not_modified) == (1, 1)
+
+    stats = session.take_stats()
+    assert (stats.requests, stats.hits, stats.misses, stats.stored) == (2, 1, 1, 1)
+    assert stats.bytes_saved == stats.bytes_downloaded == PAGE_BYTES
+    assert stats.hit_rate == 0.5
+    assert session.take_stats().requests == 0
+
+
+@pytest.mark.asyncio
+async def test_changed_page_downloaded_again(site_session):
+    site, server, session = site_session
+    url = server.make_url('/page/a')
+
+    await get_text(session, url)
+    site.versions['a'] = 1
+    assert await get_text(session, url) == site.body('a').decode()
+    assert await get_text(session, url) == site.body('a').decode()
+    assert (site.full, site.not_modified) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_awaited_get(site_session):
+    site, server, session = site_session
+    for _ in range(2):
+        response = await session.get(server.make_url('/page/a'))
+        assert await response.read() == site.body('a')
+        response.release()
+
+
+@pytest.mark.asyncio
+async def test_pages_without_validators_not_stored(site_session):
+    site, server, session = site_session
+    for _ in range(2):
+        assert await get_text(session, server.make_url('/plain')) == 'no validators'
+    assert site.full == 2
+    assert session.take_stats().stored == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_persists_across_sessions(tmp_path):
+    site = Site()
+    async with TestServer(site.app()) as server:
+        for _ in range(2):
+            session = CachingSession(aiohttp.ClientSession(), HttpCache(tmp_path / 'cache.sqlite', 1024 * 1024))
+            await get_text(session, server.make_url('/page/a'))
+            await session.close()
+    assert (site.full, site.not_modified) == (1, 1)
+
+
+def test_eviction_keeps_cache_under_max_bytes(tmp_path):
+    cache = HttpCache(tmp_path / 'cache.sqlite', max_bytes=5 * PAGE_BYTES)
+    for i in range(20):
+        cache.put(CachedPage(f'https://example.com/{i}', f'"{i}"', None, {}, b'x' * PAGE_BYTES))
+    cache.touch('https://example.com/15')
+    cache.put(CachedPage('https://example.com/new', '"new"', None, {}, b'x' * PAGE_BYTES))
+
+    assert cache.size() <= 5 * PAGE_BYTES
+    assert cache.get('https://example.com/new') is not None
+    assert cache.get('https://example.com/15') is not None
+    assert cache.get('https://example.com/0') is None
+
+
+def test_cache_file_defaults_beside_database(tmp_path, monkeypatch):
+    for name in ('BACKUP_SHELF', 'HTTP_CACHE_FILE'):
+        monkeypatch.delenv(name, raising=False)
+    settings = GuruConfig(
+        _env_file=None,
+        backup_dir=tmp_path / 'backup',
+        guru_names_file=tmp_path / 'gurus.txt',
+        guru_db=tmp_path / 'guru.db',
+        log_file=tmp_path / 'guru.log',
+        podcast_url='https://example.com/podcast',
+    )
+    assert settings.http_cache_file == tmp_path / 'http_cache.sqlite'
+    assert settings.backup_shelf == tmp_path / 'backup' / 'dtg_bot.shelf'
@@ -0,0 +1,129 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from DecodeTheBot.core.http import client_session, fetch_ordered
+from DecodeTheBot.guru_config import GuruConfig
+
+REQUESTS = 50
+LATENCY = 0.01
+PAGE = b'<html>' + b'x' * 20_000 + b'</html>'
+
+
+class StandIn:
+    """Local stand-in for the podcast site, serving pages after a delay and counting connections"""
+
+    def __init__(self, latency: float = LATENCY):
+        self.latency = latency
+        self.peers = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requested = 0
+
+    async def page(self, request: web.Request) -> web.Response:
+        self.peers.add(request.transport.get_extra_info('peername'))
+        self.requested += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if request.match_info['n'] == 'missing':
+            raise web.HTTPNotFound()
+        return web.Response(body=PAGE + request.match_info['n'].encode(), content_type='text/html')
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/episode/{n}', self.page)
+        return app
+
+
+async def fetch_each(session: aiohttp.ClientSession, server: TestServer) -> list[int]:
+    """Fetch every page one after another, as the scraper does, returning the body sizes"""
+    sizes = []
+    for n in range(REQUESTS):
+        async with session.get(server.make_url(f'/episode/{n}')) as response:
+            sizes.append(len(await response.read()))
+    return sizes
+
+
+def page(n) -> bytes:
+    return PAGE + str(n).encode()
+
+
+def settings(**kwargs) -> GuruConfig:
+    return GuruConfig.model_construct(**kwargs)
+
+
+@pytest.mark.asyncio
+async def test_pages_share_a_kept_alive_connection():
+    stand_in = StandIn()
+    server = TestServer(stand_in.app())
+    async with server, client_session(settings(http_connections=8, http_keepalive=60)) as session:
+        sizes = await fetch_each(session, server)
+
+    assert sizes == [len(page(n)) for n in range(REQUESTS)]
+    assert len(stand_in.peers) == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_bounds_connections():
+    stand_in = StandIn()
+    server = TestServer(stand_in.app())
+    async with server, client_session(settings(http_connections=4, http_keepalive=60)) as session:
+
+        async def fetch(n):
+            async with session.get(server.make_url(f'/episode/{n}')) as response:
+                return len(await response.read())
+
+        sizes = await asyncio.gather(*(fetch(n) for n in range(20)))
+
+    assert sizes == [len(page(n)) for n in range(20)]
+    assert stand_in.max_in_flight <= 4
+    assert len(stand_in.peers) <= 4
+
+
+@pytest.mark.asyncio
+async def test_fetch_ordered_runs_limit_at_once_in_order():
+    stand_in = StandIn()
+    server = TestServer(stand_in.app())
+    async with server, client_session(settings(http_connections=8, http_keepalive=60)) as session:
+        urls = [str(server.make_url(f'/episode/{n}')) for n in range(REQUESTS)]
+        bodies = [_ async for _ in fetch_ordered(session, urls, limit=4)]
+
+    assert bodies == [page(n) for n in range(REQUESTS)]
+    assert stand_in.max_in_flight == 4
+
+
+@pytest.mark.asyncio
+async def test_fetch_ordered_stops_early_and_raises_in_order():
+    stand_in = StandIn()
+    server = TestServer(stand_in.app())
+    async with server, client_session(settings(http_connections=8, http_keepalive=60)) as session:
+        urls = [str(server.make_url(f'/episode/{n}')) for n in range(REQUESTS)]
+        pages = fetch_ordered(session, urls, limit=4)
+        assert [await anext(pages) for _ in range(3)] == [page(n) for n in range(3)]
+        await pages.aclose()
+        # what was read, plus at most a window of two limits ahead
+        assert stand_in.requested <= 3 + 2 * 4
+
+        urls.insert(2, str(server.make_url('/episode/missing')))
+        bodies = []
+        with pytest.raises(aiohttp.ClientResponseError):
+            async for body in fetch_ordered(session, urls, limit=4):
+                bodies.append(body)
+        assert bodies == [page(0), page(1)]
+
+
+@pytest.mark.asyncio
+async def test_stalled_server_times_out():
+    stand_in = StandIn(latency=5)
+    server = TestServer(stand_in.app())
+    async with server, client_session(settings(http_read_timeout=0.1)) as session:
+        with pytest.raises(asyncio.TimeoutError):
+            async with session.get(server.make_url('/episode/1')) as response:
+                await response.read()
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# imported on first use only, never by importing the web app
+LAZY_MODULES = ('asyncpraw', 'fastui', 'DecodeTheBot.dtg_bot', 'DecodeTheBot.models.responses')
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of every module imported by a fresh interpreter importing module"""
+    env = {k: v for k, v in os.environ.items() if k not in ('GURU_ENV', 'REDDIT_ENV')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (_.strip() for _ in line.removeprefix('import time:').split('|'))
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_defers_heavy_modules():
+    times = import_times('DecodeTheBot.app')
+    assert 'DecodeTheBot.app' in times
+    assert not [_ for _ in times if _.split('.')[0] in LAZY_MODULES or _ in LAZY_MODULES]
+
+
+def test_settings_validated_on_first_use(monkeypatch):
+    from DecodeTheBot import guru_config
+
+    monkeypatch.delenv('GURU_ENV', raising=False)
+    guru_config.guru_settings.cache_clear()
+    with pytest.raises(ValueError, match='GURU_ENV'):
+        guru_config.guru_settings()
+    guru_config.guru_settings.cache_clear()
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlmodel import SQLModel
+
+from DecodeTheBot.core.database import create_db
+
+QUERIES = {
+    'ix_guruepisodelink_episode_id': 'SELECT guru_id FROM guruepisodelink WHERE episode_id = 1',
+    'ix_redditthreadepisodelink_episode_id': 'SELECT reddit_thread_id FROM redditthreadepisodelink WHERE episode_id = 1',
+    'ix_redditthreadgurulink_guru_id': 'SELECT reddit_thread_id FROM redditthreadgurulink WHERE guru_id = 1',
+    'ix_episode_date_id': 'SELECT id FROM episode ORDER BY date DESC, id DESC LIMIT 20',
+    'ix_redditthread_created_datetime': 'SELECT id FROM redditthread ORDER BY created_datetime DESC LIMIT 20',
+}
+
+
+def query_plan(engine, query: str) -> str:
+    with engine.connect() as conn:
+        return ' '.join(row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {query}')))
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database created before the indexes existed"""
+    engine = create_engine(f'sqlite:///{tmp_path}/legacy.db')
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for index in QUERIES:
+            conn.execute(text(f'DROP INDEX {index}'))
+    return engine
+
+
+@pytest.mark.parametrize('index, query', QUERIES.items())
+def test_create_db_adds_missing_indexes(legacy_engine, index, query):
+    assert index not in query_plan(legacy_engine, query)
+    create_db(legacy_engine)
+    plan = query_plan(legacy_engine, query)
+    assert index in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, select
+
+from DecodeTheBot.core import database
+from DecodeTheBot.core.dedupe import HashIndex
+from DecodeTheBot.dtb_htmx.guru_route import gurus_statement
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import batch_bot, fake_episode_dict, fake_thread_dict, memory_engine
+
+
+def counts(session: Session) -> dict[str, tuple[int, int, int]]:
+    return {_.name: (_.episode_count, _.thread_count, _.interest) for _ in session.exec(select(Guru)).all()}
+
+
+def test_commit_batch_maintains_counters():
+    with Session(memory_engine()) as session:
+        session.add_all([Guru(name='Synthetic Episode 1'), Guru(name='Synthetic'), Guru(name='Nobody')])
+        session.commit()
+        bot = batch_bot(session)
+        bot.hash_index[RedditThread] = HashIndex()
+        bot.commit_batch([Episode.model_validate(fake_episode_dict(i)) for i in range(1, 4)], Episode, [Guru])
+        bot.commit_batch([RedditThread.model_validate(fake_thread_dict(i)) for i in range(2)], RedditThread, [Guru])
+        session.expire_all()
+
+        maintained = counts(session)
+        database.recount_interest(session)
+        session.expire_all()
+        assert maintained == counts(session)
+        assert maintained['Synthetic'][2] > maintained['Synthetic Episode 1'][2] > 0
+        assert maintained['Nobody'] == (0, 0, 0)
+
+
+def test_migration_adds_and_backfills_counters():
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE guru (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, notes JSON)'))
+        conn.execute(text("INSERT INTO guru (id, name, notes) VALUES (1, 'Old Guru', '[]'), (2, 'Idle Guru', '[]')"))
+        conn.execute(text('CREATE TABLE guruepisodelink (guru_id INTEGER, episode_id INTEGER)'))
+        conn.execute(text('INSERT INTO guruepisodelink VALUES (1, 1), (1, 2)'))
+
+    database.create_db(engine)
+
+    with Session(engine) as session:
+        assert counts(session) == {'Old Guru': (2, 0, 2), 'Idle Guru': (0, 0, 0)}
+        assert [_.name for _ in session.exec(gurus_statement()).all()] == ['Old Guru']
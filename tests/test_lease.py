@@ -0,0 +1,87 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+from DecodeTheBot.core import database
+from DecodeTheBot.core.database import make_engine
+from DecodeTheBot.core.lease import LeaseLost, WriterLease
+from DecodeTheBot.models.meta import WorkerLease, utcnow
+
+
+def test_single_writer(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path}/lease.db', {'journal_mode': 'wal', 'busy_timeout': 5_000})
+    first = WriterLease(engine, ttl=60, holder='worker-1')
+    second = WriterLease(engine, ttl=60, holder='worker-2')
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.acquire()
+    assert second.current_holder() == 'worker-1'
+
+    first.release()
+    assert second.acquire()
+    assert not first.renew()
+
+
+def test_stale_lease_taken_over(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path}/lease.db')
+    stalled = WriterLease(engine, ttl=60, holder='stalled')
+    assert stalled.acquire()
+    with engine.begin() as conn:
+        conn.execute(update(WorkerLease).values(heartbeat=utcnow() - timedelta(seconds=61)))
+
+    fresh = WriterLease(engine, ttl=60, holder='fresh')
+    assert fresh.acquire()
+    assert not stalled.renew()
+    assert fresh.renew()
+
+
+@pytest.mark.asyncio
+async def test_keep_renews_while_writer_busy(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path}/lease.db', {'journal_mode': 'wal', 'busy_timeout': 5_000})
+    lease = WriterLease(engine, ttl=1, holder='worker')
+    assert lease.acquire()
+    with engine.connect() as conn:
+        acquired = conn.execute(select(WorkerLease.heartbeat)).scalar()
+
+    keeper = asyncio.create_task(lease.keep())
+    # a long job on the writer thread does not hold up the heartbeat
+    await database.run_write(time.sleep, 1)
+    with engine.connect() as conn:
+        assert conn.execute(select(WorkerLease.heartbeat)).scalar() > acquired
+
+    with engine.begin() as conn:
+        conn.execute(update(WorkerLease).values(holder='usurper'))
+    with pytest.raises(LeaseLost):
+        await asyncio.wait_for(keeper, 2)
+
+
+def locked(*args):
+    raise OperationalError('UPDATE workerlease', {}, Exception('database is locked'))
+
+
+@pytest.mark.asyncio
+async def test_keep_retries_busy_database(tmp_path, monkeypatch):
+    lease = WriterLease(make_engine(f'sqlite:///{tmp_path}/lease.db'), ttl=0.3, holder='worker')
+    assert lease.acquire()
+    renew, attempts = lease.renew, []
+
+    def busy_twice():
+        attempts.append(None)
+        return locked() if len(attempts) <= 2 else renew()
+
+    monkeypatch.setattr(lease, 'renew', busy_twice)
+    keeper = asyncio.create_task(lease.keep())
+    await asyncio.sleep(0.5)
+    assert len(attempts) >= 3
+    assert not keeper.done()
+    keeper.cancel()
+
+    # a database busy for the whole ttl gives the lease up
+    monkeypatch.setattr(lease, 'renew', locked)
+    with pytest.raises(LeaseLost):
+        await asyncio.wait_for(lease.keep(), 1)
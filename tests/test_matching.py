@@ -1,10 +1,17 @@
-import pytest
-from loguru import logger
+import random
+import string
+import tracemalloc
+
 from sqlmodel import Session
 
-from src.DecodeTheBot.models.guru import Guru
-from src.DecodeTheBot.models.episode import Episode
-from src.DecodeTheBot.dtg_bot import db_obj_matches
+from DecodeTheBot.core import matcher as matcher_module
+from DecodeTheBot.core.matcher import Matcher
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import batch_bot, fake_episode_dict, memory_engine
+
+ROWS = 5_000
 
 
 # @pytest.mark.asyncio
@@ -22,12 +29,76 @@ from src.DecodeTheBot.dtg_bot import db_obj_matches
 #     assert len(matches) > 0
 #     assert all(isinstance(match, Guru) for match in matches)
 #
-@pytest.mark.asyncio
-async def test_all_matches(test_session_with_gurus: Session, random_episode: Episode):
-    logger.info(f"\nmay fail if random ep has no matches: {random_episode}")
-    matches = db_obj_matches(test_session_with_gurus, random_episode, Guru)
-    assert len(matches) > 0
-    assert all(isinstance(match, Guru) for match in matches)
+def test_all_matches():
+    with Session(memory_engine()) as session:
+        session.add_all(Guru(name=_) for _ in ('Episode 7', 'Synthetic', 'Unrelated'))
+        session.commit()
+        bot = batch_bot(session)
+    episode = Episode.model_validate(fake_episode_dict(7))
+    episode.id = 1
+
+    rows = bot.link_rows(episode, Guru)
+
+    assert sorted(rows, key=lambda _: _['guru_id']) == [
+        {'episode_id': 1, 'guru_id': 1},
+        {'episode_id': 1, 'guru_id': 2},
+    ]
+    assert bot.link_rows(episode, Episode) == []
+
+
+def test_matcher_both_directions():
+    matcher = Matcher(Guru)
+    matcher.add(1, 'Sam Harris')
+    matcher.add(2, 'Jordan Peterson')
+    matcher.add(3, 'Elon Musk')
+    assert matcher.matches('Interview with SAM HARRIS and Jordan Peterson') == {1, 2}
+    assert matcher.matches('musk') == {3}
+    assert matcher.matches('Lex Fridman') == set()
+
+
+def test_matcher_incremental():
+    matcher = Matcher(RedditThread)
+    matcher.add(1, 'Episode discussion: Decoding Elon Musk')
+    assert matcher.matches('Decoding Elon Musk') == {1}
+    matcher.add(2, 'Elon')
+    assert matcher.matches('Decoding Elon Musk') == {1, 2}
+
+
+def test_matcher_agrees_with_substring_checks(monkeypatch):
+    # small blocks and runs, so adding rows splits blocks and building merges runs
+    monkeypatch.setattr(matcher_module, 'BLOCK', 4)
+    monkeypatch.setattr(matcher_module, 'RUN', 7)
+    rng = random.Random(1)
+    words = ['elon', 'musk', 'sam', 'harris', 'decoding', 'the', 'gurus', 'episode', 'on', 'e']
+    values = [' '.join(rng.choices(words, k=rng.randint(1, 5))) for _ in range(60)]
+    matcher = Matcher(RedditThread)
+    matcher.extend(enumerate(values[:30]))
+    for id_, value in enumerate(values[30:], start=30):
+        matcher.add(id_, value)
+
+    texts = values + [' '.join(rng.choices(words, k=rng.randint(1, 3))) for _ in range(100)] + ['e', 'x', 'n e']
+    for text in texts:
+        expected = {id_ for id_, value in enumerate(values) if value in text or text in value}
+        assert matcher.matches(text.upper()) == expected
+
+
+def test_matcher_memory_per_row():
+    rng = random.Random(0)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(2_000)]
+    rows = [(i, ' '.join(rng.choices(words, k=9))) for i in range(ROWS)]
+    tracemalloc.start()
+    try:
+        matcher = Matcher(RedditThread)
+        matcher.extend(rows[:-200])
+        for id_, value in rows[-200:]:
+            matcher.add(id_, value)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # titles average 60 characters, each suffix is a 4-byte position, building sorts a run of suffixes at a time
+    assert current < ROWS * 1024
+    assert peak < ROWS * 3 * 1024
+    assert matcher.matches(rows[7][1][10:30]) >= {7}
 
 
 #
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import sqlalchemy as sqa
+from sqlmodel import Session
+
+from DecodeTheBot.core import database
+from DecodeTheBot.dtb_htmx import episode_route
+from DecodeTheBot.guru_config import GuruConfig
+from DecodeTheBot.models.episode_m import Episode
+from tests.conftest import fake_episode_dict, make_web_app, memory_engine, populate
+
+SLOW_COMMIT = 0.5
+
+
+def slow_commit(session: Session):
+    """Insert episodes in a commit that holds its transaction open for SLOW_COMMIT"""
+    session.add_all(Episode.model_validate(fake_episode_dict(i)) for i in range(50, 60))
+    session.flush()
+    sqa.event.listen(session, 'before_commit', lambda _: time.sleep(SLOW_COMMIT), once=True)
+    session.commit()
+
+
+@pytest.fixture
+def web_app(monkeypatch):
+    monkeypatch.setattr(episode_route, 'guru_settings', lambda: GuruConfig.model_construct())
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=50)
+    return make_web_app(engine), engine
+
+
+@pytest.mark.asyncio
+async def test_web_latency_bounded_while_bot_commits(web_app):
+    app, engine = web_app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        with Session(engine) as bot_session:
+            commit = asyncio.create_task(database.run_write(slow_commit, bot_session))
+            await asyncio.sleep(0.01)
+
+            start = time.perf_counter()
+            response = await client.get('/eps/get_eps/')
+            latency = time.perf_counter() - start
+
+            assert not commit.done()
+            await commit
+
+    assert response.status_code == 200
+    assert latency < SLOW_COMMIT / 2
@@ -0,0 +1,60 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from DecodeTheBot.core import database
+from DecodeTheBot.dtb_htmx import episode_route, guru_route
+from DecodeTheBot.guru_config import GuruConfig
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.links import GuruEpisodeLink
+from tests.conftest import make_web_app, memory_engine, populate
+
+PAGE_SIZE = 7
+NEXT_URL = re.compile(r'hx-get="([^"]+)"')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for module in (episode_route, guru_route):
+        monkeypatch.setattr(module, 'guru_settings', lambda: GuruConfig.model_construct(page_size=PAGE_SIZE))
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=20)
+        session.add_all(Guru(name=f'Guru {i:02}') for i in range(10))
+        session.commit()
+        # guru n is linked to n + 1 episodes
+        session.add_all(GuruEpisodeLink(guru_id=g, episode_id=e) for g in range(1, 11) for e in range(1, g + 1))
+        database.recount_interest(session)
+        session.commit()
+    return TestClient(make_web_app(engine))
+
+
+def walk_pages(client, url: str) -> list[str]:
+    titles = []
+    while url:
+        html = client.get(url).text
+        titles.extend(re.findall(r'<div class="card-title">(.+?)</div>', html))
+        url = next_url.group(1).replace('&amp;', '&') if (next_url := NEXT_URL.search(html)) else None
+    return titles
+
+
+def test_episode_pages_walk_newest_first(client):
+    first = client.get('/eps/get_eps/').text
+    assert first.count('class="card"') == PAGE_SIZE
+
+    titles = walk_pages(client, '/eps/get_eps/')
+    assert titles == [f'Synthetic Episode {i}' for i in range(19, -1, -1)]
+
+
+def test_guru_pages_walk_by_interest(client):
+    titles = walk_pages(client, '/guru/get_gurus/')
+    assert titles == [f'Guru {i:02}' for i in range(9, -1, -1)]
+
+
+def test_guru_card_shows_newest_episodes(client):
+    html = client.get('/guru/get_gurus/').text
+    first_card = html.split('</article>')[0]
+    notes = re.findall(r'<p class="episode-note">(.+?)</p>', first_card)
+    assert notes == [f'Synthetic Episode {i}' for i in (9, 8, 7)] + ['and 7 more']
@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from DecodeTheBot.core import database
+from DecodeTheBot.dtb_htmx import episode_route, guru_route
+from DecodeTheBot.guru_config import GuruConfig
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.links import GuruEpisodeLink, RedditThreadEpisodeLink
+from tests.conftest import count_queries, make_web_app, memory_engine, populate
+
+PAGE_SIZE = 10
+
+
+def linked_db(n_gurus: int, eps_per_guru: int):
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=n_gurus * eps_per_guru, n_threads=eps_per_guru)
+        session.add_all(Guru(name=f'Guru {i:04}') for i in range(n_gurus))
+        session.commit()
+        session.add_all(
+            GuruEpisodeLink(guru_id=g + 1, episode_id=g * eps_per_guru + e + 1)
+            for g in range(n_gurus)
+            for e in range(eps_per_guru)
+        )
+        session.add_all(RedditThreadEpisodeLink(reddit_thread_id=t + 1, episode_id=1) for t in range(eps_per_guru))
+        database.recount_interest(session)
+        session.commit()
+    return engine
+
+
+@pytest.fixture(autouse=True)
+def page_size(monkeypatch):
+    for module in (episode_route, guru_route):
+        monkeypatch.setattr(module, 'guru_settings', lambda: GuruConfig.model_construct(page_size=PAGE_SIZE))
+
+
+@pytest.mark.parametrize('url', ['/guru/get_gurus/', '/guru/1/', '/eps/1/', '/eps/get_eps/'])
+def test_query_count_independent_of_rows(url, fresh_fragment_cache):
+    counts = []
+    for n_gurus, eps_per_guru in ((PAGE_SIZE * 2, 2), (PAGE_SIZE * 10, 8)):
+        # both databases start at data version 0, don't serve the second from the first's fragments
+        fresh_fragment_cache.clear()
+        engine = linked_db(n_gurus, eps_per_guru)
+        client = TestClient(make_web_app(engine))
+        with count_queries(engine) as queries:
+            assert client.get(url).status_code == 200
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
+    # the data version for conditional GETs, then the rows and one query per eager loaded relation
+    assert counts[0] <= 4
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from DecodeTheBot.core.queues import MonitoredQueue
+
+
+@pytest.mark.asyncio
+async def test_put_blocks_when_full():
+    queue = MonitoredQueue(maxsize=2, name='test')
+    await queue.put(1)
+    await queue.put(2)
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(queue.put(3), 0.05)
+    assert queue.qsize() == 2
+
+
+@pytest.mark.asyncio
+async def test_stats():
+    queue = MonitoredQueue(maxsize=10, name='test')
+    for i in range(4):
+        await queue.put(i)
+    queue.put_nowait(4)
+    await asyncio.sleep(0.01)
+    assert [await queue.get() for _ in range(2)] + [queue.get_nowait()] == [0, 1, 2]
+
+    stats = queue.stats()
+    assert stats.name == 'test'
+    assert stats.depth == 2
+    assert stats.high_water == 5
+    assert (stats.enqueued, stats.dequeued) == (5, 3)
+    assert stats.enqueue_rate > stats.dequeue_rate > 0
+    assert stats.wait_max >= stats.wait_p50 >= 0.01
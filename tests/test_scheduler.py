@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from DecodeTheBot.core.scheduler import PollScheduler
+
+
+def scheduler(**kwargs) -> PollScheduler:
+    return PollScheduler('test', interval=600, min_interval=60, max_interval=3600, jitter=0, **kwargs)
+
+
+def test_interval_follows_posting_frequency():
+    poller = scheduler()
+    for _ in range(20):
+        poller.record(new_items=0, latency=0.1)
+    assert poller.interval == 3600
+
+    poller.record(new_items=2, latency=0.1)
+    poller.record(new_items=1, latency=0.1)
+    assert poller.interval == 900
+    for _ in range(10):
+        poller.record(new_items=1, latency=0.1)
+    assert poller.next_delay() == 60
+
+
+def test_errors_back_off_exponentially_with_jitter():
+    poller = scheduler(max_backoff=2000)
+    ceilings = []
+    for _ in range(5):
+        poller.record_error(latency=1)
+        delays = [poller.next_delay() for _ in range(200)]
+        assert all(60 <= _ <= 2000 for _ in delays)
+        assert len(set(delays)) > 1
+        ceilings.append(max(delays))
+    assert ceilings[0] <= 1200 < ceilings[1]
+
+    poller.record(new_items=0, latency=0.1)
+    assert poller.consecutive_errors == 0
+    assert poller.next_delay() == poller.interval
+
+
+def test_backoff_capped_after_many_errors():
+    poller = scheduler(max_backoff=2000)
+    for _ in range(2_000):
+        poller.record_error(latency=1)
+    assert all(60 <= poller.next_delay() <= 2000 for _ in range(100))
+
+
+def test_waits_for_rate_limit_reset():
+    poller = scheduler()
+    assert poller.next_delay((500, 300)) == 600
+    assert poller.next_delay((5, 900)) == 900
+
+
+@pytest.mark.asyncio
+async def test_run_records_latency_and_survives_errors():
+    poller = PollScheduler('test', interval=0.01, min_interval=0.01, max_interval=0.02)
+    outcomes = iter([3, RuntimeError('feed down'), 0, 0])
+
+    async def poll() -> int:
+        await asyncio.sleep(0.005)
+        if (outcome := next(outcomes, None)) is None:
+            raise asyncio.CancelledError
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with pytest.raises(asyncio.CancelledError):
+        await poller.run(poll)
+    stats = poller.stats()
+    assert (stats.polls, stats.errors, stats.new_items) == (4, 1, 3)
+    assert stats.latency_p50 >= 0.005
@@ -0,0 +1,62 @@
+import pytest
+from sqlmodel import Session
+
+from DecodeTheBot.core import search
+from DecodeTheBot.dtb_htmx.episode_route import episode_matches
+from DecodeTheBot.dtb_htmx.guru_route import guru_matches
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.links import GuruEpisodeLink
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import fake_episode_dict, memory_engine, populate
+
+CORPUS = 2_000
+
+
+@pytest.fixture(scope='module')
+def search_session():
+    engine = memory_engine()
+    search.create_fts(engine)
+    with Session(engine) as session:
+        populate(session, n_episodes=CORPUS, n_threads=1_000)
+        guru = Guru(name='Sam Harris')
+        episode = Episode.model_validate(fake_episode_dict(CORPUS) | {'title': 'Decoding Sam Harris'})
+        long_title = 'A long conversation with Jordan Peterson about many other things'
+        session.add_all(
+            [guru, episode]
+            + [
+                Episode.model_validate(fake_episode_dict(CORPUS + i) | {'title': title})
+                for i, title in enumerate((long_title, 'Jordan Peterson'), start=1)
+            ]
+        )
+        session.commit()
+        session.add(GuruEpisodeLink(guru_id=guru.id, episode_id=episode.id))
+        session.commit()
+        search.rebuild(session)
+        session.commit()
+        yield session
+
+
+def test_in_sync(search_session):
+    assert search.in_sync(search_session)
+
+
+def test_episode_search_by_kind(search_session):
+    assert [_.title for _ in episode_matches(search_session, 'harris', 'title')] == ['Decoding Sam Harris']
+    assert [_.title for _ in episode_matches(search_session, 'sam har', 'guru')] == ['Decoding Sam Harris']
+    assert 'Synthetic Episode 1999' in [_.title for _ in episode_matches(search_session, 'episode 1999', 'notes')]
+
+
+def test_guru_search_by_episode(search_session):
+    assert [_.name for _ in guru_matches(search_session, 'decoding sam', 'episode')] == ['Sam Harris']
+    assert [_.name for _ in guru_matches(search_session, 'sam', 'name')] == ['Sam Harris']
+
+
+def test_search_ranks_filters_and_limits(search_session):
+    assert [_.title for _ in episode_matches(search_session, 'peterson', 'title')] == [
+        'Jordan Peterson',
+        'A long conversation with Jordan Peterson about many other things',
+    ]
+    assert len(search.search(search_session, Episode, 'synthetic', limit=20)) == 20
+    assert search.search(search_session, Episode, 'thread') == []
+    assert len(search.search(search_session, RedditThread, 'synthetic thread')) == 1_000
@@ -0,0 +1,56 @@
+import gc
+import tracemalloc
+
+from sqlmodel import Session, select
+
+from DecodeTheBot.core.dedupe import HashIndex
+from DecodeTheBot.core.matcher import Matcher
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import fake_episode_dict, memory_engine, offline_bot
+
+ITEMS = 10_000
+BATCH = 1_000
+SAMPLE_EVERY = 1_000
+# memory allocated by the ORM and validation layers, which a long-lived session would hold on to
+ORM_FILES = [tracemalloc.Filter(True, f'*{_}*') for _ in ('sqlalchemy', 'sqlmodel', 'pydantic')]
+# allowed growth after warm up, however many items are ingested
+ORM_GROWTH = 512 * 1024
+
+
+def orm_memory() -> int:
+    gc.collect()
+    return sum(_.size for _ in tracemalloc.take_snapshot().filter_traces(ORM_FILES).statistics('filename'))
+
+
+def test_ingest_memory_flat():
+    engine = memory_engine()
+    with Session(engine) as session:
+        session.add_all(Guru(name=f'Synthetic Episode {i}') for i in range(0, ITEMS, 997))
+        session.commit()
+        bot = offline_bot()
+        bot.engine = engine
+        bot.hash_index = {Episode: HashIndex()}
+        bot.matchers = {model: Matcher.from_session(session, model) for model in (Episode, RedditThread, Guru)}
+
+    samples = []
+    tracemalloc.start()
+    try:
+        for start in range(0, ITEMS, BATCH):
+            batch = [Episode.model_validate(fake_episode_dict(i)) for i in range(start, start + BATCH)]
+            bot.commit_batch(batch, Episode, relation_classes=[Guru])
+            if (start + BATCH) % SAMPLE_EVERY == 0:
+                samples.append(orm_memory())
+    finally:
+        tracemalloc.stop()
+    del batch
+
+    # ignore warm up. The matchers keep each committed id, ints the driver allocated, about 300 KiB in all,
+    # while a retained Episode costs several KiB
+    assert samples[-1] - samples[1] < ORM_GROWTH
+    # isinstance looks up __class__, which SQLAlchemy's class registry modules answer with NameError
+    assert not [_ for _ in gc.get_objects() if type(_) is Episode]
+
+    with Session(engine) as session:
+        assert len(session.exec(select(Episode.id)).all()) == ITEMS
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, select
+
+from DecodeTheBot.core.database import make_engine
+from DecodeTheBot.models.episode_m import Episode
+from tests.conftest import fake_episode_dict
+
+WRITES = 300
+READERS = 4
+PROFILE = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64_000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5_000,
+    'temp_store': 'memory',
+}
+# PRAGMA queries answer with the numeric value of named settings
+APPLIED = PROFILE | {'synchronous': 1, 'temp_store': 2}
+
+
+def pragma_values(engine, pragmas) -> dict:
+    with engine.connect() as conn:
+        return {_: conn.exec_driver_sql(f'PRAGMA {_}').scalar() for _ in pragmas}
+
+
+def test_profile_pragmas_applied(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path}/profile.db', PROFILE)
+    assert pragma_values(engine, APPLIED) == APPLIED
+
+    default = make_engine(f'sqlite:///{tmp_path}/default.db')
+    assert pragma_values(default, ['journal_mode', 'synchronous']) == {'journal_mode': 'delete', 'synchronous': 2}
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    path = tmp_path / 'ro.db'
+    SQLModel.metadata.create_all(make_engine(f'sqlite:///{path}', PROFILE))
+    ro_engine = make_engine(f'sqlite:///file:{path}?mode=ro&uri=true', PROFILE, read_only=True)
+    assert pragma_values(ro_engine, ['query_only', 'busy_timeout']) == {'query_only': 1, 'busy_timeout': 5_000}
+    with Session(ro_engine) as session:
+        assert session.exec(select(func.count(Episode.id))).one() == 0
+        session.add(Episode.model_validate(fake_episode_dict(0)))
+        with pytest.raises(OperationalError, match='readonly'):
+            session.commit()
+
+
+def test_readers_not_blocked_by_writer(tmp_path):
+    path = tmp_path / 'profiled.db'
+    write_engine = make_engine(f'sqlite:///{path}', PROFILE)
+    SQLModel.metadata.create_all(write_engine)
+    read_engine = make_engine(f'sqlite:///file:{path}?mode=ro&uri=true', PROFILE, read_only=True)
+    done = threading.Event()
+    reads = [0] * READERS
+    errors = []
+
+    def reader(n):
+        with Session(read_engine) as session:
+            while not done.is_set():
+                try:
+                    session.exec(select(func.count(Episode.id))).one()
+                    reads[n] += 1
+                except OperationalError as e:
+                    errors.append(e)
+                session.rollback()
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(READERS)]
+    for thread in threads:
+        thread.start()
+    # one writer committing row by row, as the bot did before batching
+    with Session(write_engine) as session:
+        for i in range(WRITES):
+            session.add(Episode.model_validate(fake_episode_dict(i)))
+            session.commit()
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert all(reads)
+    with Session(read_engine) as session:
+        assert session.exec(select(func.count(Episode.id))).one() == WRITES
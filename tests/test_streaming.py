@@ -0,0 +1,74 @@
+import asyncio
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from tests.conftest import make_web_app, memory_engine, populate
+
+
+def archive_app(n_episodes: int):
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=n_episodes)
+    return make_web_app(engine)
+
+
+async def consume(app, path: str) -> tuple[bytes, int, int]:
+    """Run one GET through the app, keeping only the first body chunk, the total size and the chunk count"""
+    first, total, chunks = None, 0, 0
+    disconnect = asyncio.Event()
+
+    async def receive():
+        if disconnect.is_set():
+            await asyncio.Future()
+        disconnect.set()
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal first, total, chunks
+        if message['type'] == 'http.response.body' and (body := message.get('body')):
+            first = body if first is None else first
+            total += len(body)
+            chunks += 1
+
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(b'host', b'test')],
+        'server': ('test', 80),
+        'client': ('test', 1),
+    }
+    await app(scope, receive, send)
+    return first, total, chunks
+
+
+def test_archive_lists_every_episode():
+    html = TestClient(archive_app(120)).get('/eps/archive/').text
+    assert html.count('class="card"') == 120
+    assert html.index('Synthetic Episode 119') < html.index('Synthetic Episode 0<')
+
+
+@pytest.mark.asyncio
+async def test_archive_head_first_and_memory_flat():
+    peaks, totals = [], []
+    for n_episodes in (2_000, 10_000):
+        app = archive_app(n_episodes)
+        tracemalloc.start()
+        first, total, chunks = await consume(app, '/eps/archive/')
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        totals.append(total)
+        assert first.startswith(b'<!DOCTYPE html>') and b'class="card"' not in first[:200]
+        assert chunks > 1
+    # five times the page through the same peak memory
+    assert totals[1] > totals[0] * 4
+    assert peaks[1] < peaks[0] * 1.5
@@ -0,0 +1,110 @@
+import datetime as dt
+from types import SimpleNamespace
+
+import sqlalchemy as sqa
+from sqlmodel import Session, select
+
+from DecodeTheBot.core import database
+from DecodeTheBot.guru_config import GuruConfig
+from DecodeTheBot.models.reddit_m import RedditThread, payload_defers
+from tests.conftest import memory_engine
+
+N_THREADS = 300
+FIELDS = GuruConfig.model_fields['submission_fields'].default
+
+
+def fake_submission(i: int) -> SimpleNamespace:
+    """Roughly the shape of vars(asyncpraw Submission): a hundred or so scalars plus a few objects"""
+    attrs = {f'attr_{n:03d}': f'value {n} of submission {i}' for n in range(80)}
+    attrs.update({f'flag_{n:02d}': bool(n % 2) for n in range(20)})
+    attrs.update(
+        id=f't{i:07x}',
+        name=f't3_t{i:07x}',
+        title=f'Synthetic Thread {i}',
+        shortlink=f'https://redd.it/t{i:07x}',
+        permalink=f'/r/DecodingTheGurus/comments/t{i:07x}/synthetic_thread_{i}/',
+        url=f'https://example.com/{i}',
+        selftext=f'body of thread {i}',
+        created_utc=(dt.datetime(2020, 1, 1) + dt.timedelta(minutes=i)).timestamp(),
+        score=i % 100,
+        num_comments=i % 30,
+        author=object(),
+        subreddit=object(),
+    )
+    return SimpleNamespace(**attrs)
+
+
+def test_from_submission_keeps_projected_scalars():
+    thread = RedditThread.from_submission(fake_submission(1), fields=FIELDS)
+    assert set(thread.submission) == set(FIELDS) & set(vars(fake_submission(1)))
+    assert thread.submission_raw is None
+
+    full = RedditThread.from_submission(fake_submission(1))
+    assert 'attr_000' in full.submission
+    assert 'author' not in full.submission
+
+
+def test_raw_submission_round_trips():
+    thread = RedditThread.from_submission(fake_submission(1), fields=FIELDS, keep_raw=True)
+    assert thread.raw_submission == RedditThread.from_submission(fake_submission(1)).submission
+    assert len(thread.submission_raw) < len(str(thread.raw_submission))
+
+
+def test_compact_submissions():
+    engine = memory_engine()
+    with Session(engine) as session:
+        session.add_all(RedditThread.from_submission(fake_submission(i)) for i in range(10))
+        session.commit()
+
+        assert database.compact_submissions(session, FIELDS, batch_size=3) == 10
+        session.commit()
+        for thread in session.exec(select(RedditThread)).all():
+            assert set(thread.submission) <= set(FIELDS)
+            assert thread.submission['id'] == thread.reddit_id
+        assert database.compact_submissions(session, FIELDS) == 0
+
+
+def test_payload_defers():
+    engine = memory_engine()
+    with Session(engine) as session:
+        session.add(RedditThread.from_submission(fake_submission(1), fields=FIELDS, keep_raw=True))
+        session.commit()
+        session.expunge_all()
+
+        thread = session.exec(select(RedditThread).options(*payload_defers())).one()
+        unloaded = sqa.inspect(thread).unloaded
+        assert {'submission', 'submission_raw'} <= unloaded
+        assert thread.submission['id'] == thread.reddit_id
+
+
+def store_threads(engine, fields) -> int:
+    """Bytes of submission payload stored for N_THREADS threads projected to fields"""
+    database.create_db(engine)
+    with Session(engine) as session:
+        rows = [
+            RedditThread.from_submission(fake_submission(i), fields=fields).model_dump(exclude={'id'})
+            for i in range(N_THREADS)
+        ]
+        session.execute(sqa.insert(RedditThread), rows)
+        session.commit()
+        return session.exec(select(sqa.func.sum(sqa.func.length(RedditThread.submission)))).one()
+
+
+def test_projection_saves_space():
+    full_size = store_threads(memory_engine(), None)
+    compact_size = store_threads(memory_engine(), FIELDS)
+    assert compact_size < full_size / 10
+
+
+def test_deferred_load_skips_payload_columns():
+    engine = memory_engine()
+    store_threads(engine, FIELDS)
+    statements = []
+    sqa.event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    for options in ((), payload_defers()):
+        with Session(engine) as session:
+            assert len(session.exec(select(RedditThread).options(*options)).all()) == N_THREADS
+    full, deferred = statements
+    assert 'redditthread.submission,' in full and 'redditthread.submission_raw' in full
+    assert 'submission' not in deferred
@@ -0,0 +1,117 @@
+import random
+import threading
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete
+
+from DecodeTheBot.core import database
+from DecodeTheBot.core.trigram import TrigramIndex, normalise, trigrams
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from tests.conftest import fake_episode_dict, make_web_app, memory_engine, populate
+
+N_STRINGS = 100_000
+SYLLABLES = ['ka', 'ro', 'mi', 'te', 'su', 'lan', 'ber', 'ton', 'vic', 'shel', 'dra', 'po', 'ne', 'gu', 'ri', 'an']
+
+
+def typo(rng: random.Random, text: str) -> str:
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice('abcdefghij') + text[i + 1 :]
+
+
+def test_typo_tolerant():
+    index = TrigramIndex()
+    for i, title in enumerate(['Sam Harris', 'Jordan Peterson', 'Eric Weinstein', 'Bret Weinstein']):
+        index.add(i, title)
+    assert index.search('jordon peterson', 1)[0].text == 'Jordan Peterson'
+    assert index.search('weinst', 2)[0].text.endswith('Weinstein')
+    assert index.search('!!', 5) == []
+
+
+def test_ranking_over_large_corpus():
+    rng = random.Random(0)
+    words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(5_000)]
+    texts = [' '.join(rng.choice(words) for _ in range(rng.randint(2, 8))) for _ in range(N_STRINGS)]
+    index = TrigramIndex()
+    for i, text in enumerate(texts):
+        index.add(i, text)
+
+    found = 0
+    for _ in range(200):
+        i = rng.randrange(N_STRINGS)
+        query = normalise(texts[i][: rng.randint(3, 25)])
+        hits = index.search(query, 10)
+        assert len(hits) == 10
+        assert [_.score for _ in hits] == sorted((_.score for _ in hits), reverse=True)
+        # completions of the query rank above near misses
+        contains = [query in normalise(_.text) for _ in hits]
+        assert contains == sorted(contains, reverse=True)
+        found += i in [_.key for _ in index.search(typo(rng, texts[i]), 10)]
+    # the scan budget skips the commonest grams, so a mistyped full string is usually but not always found
+    assert found > 200 * 0.7
+
+
+def test_removed_strings_not_found():
+    index = TrigramIndex()
+    for i, title in enumerate(['Sam Harris', 'Jordan Peterson', 'Eric Weinstein', 'Bret Weinstein']):
+        index.add(i, title)
+    index.remove(2)
+    assert [_.text for _ in index.search('weinstein', 5)] == ['Bret Weinstein']
+    assert len(index) == 3
+
+    # removing most strings rebuilds the posting lists from the rest
+    index.remove(0)
+    index.remove(3)
+    assert index._postings == TrigramIndex()._postings | {_: [0] for _ in trigrams('jordan peterson')}
+    assert [_.key for _ in index.search('jordan', 5)] == [1]
+    index.add(4, 'Sam Harris')
+    assert [_.key for _ in index.search('harris', 5)] == [4]
+
+
+def test_search_while_adding():
+    index = TrigramIndex()
+    stop = threading.Event()
+
+    def add():
+        i = 0
+        while not stop.is_set():
+            index.add(i, f'episode {i}')
+            if i % 3 == 0:
+                index.remove(i)
+            i += 1
+
+    adder = threading.Thread(target=add)
+    adder.start()
+    try:
+        for _ in range(2_000):
+            assert all(_.key % 3 for _ in index.search('episode 1', 5))
+    finally:
+        stop.set()
+        adder.join()
+
+
+def test_endpoint_follows_bot_commits():
+    engine = memory_engine()
+    with Session(engine) as session:
+        populate(session, n_episodes=20, n_threads=5)
+        session.add(Guru(name='Jordan Peterson'))
+        database.bump_data_version(session)
+        session.commit()
+    client = TestClient(make_web_app(engine))
+
+    html = client.get('/typeahead/', params={'q': 'jordn'}).text
+    assert 'Jordan Peterson' in html and '/guru/1' in html
+
+    assert 'Brand New Episode' not in client.get('/typeahead/', params={'q': 'brand new'}).text
+    with Session(engine) as session:
+        session.add(Episode.model_validate(fake_episode_dict(1000) | {'title': 'Brand New Episode'}))
+        database.bump_data_version(session)
+        session.commit()
+    assert 'Brand New Episode' in client.get('/typeahead/', params={'q': 'brand nwe'}).text
+
+    with Session(engine) as session:
+        session.execute(delete(Episode).where(Episode.title == 'Brand New Episode'))
+        database.bump_data_version(session)
+        session.commit()
+    assert 'Brand New Episode' not in client.get('/typeahead/', params={'q': 'brand nwe'}).text
+    assert 'Jordan Peterson' in client.get('/typeahead/', params={'q': 'jordn'}).text
@@ -0,0 +1,58 @@
+import datetime as dt
+
+import pytest
+from sqlmodel import Session
+
+from DecodeTheBot.core import watermarks
+from DecodeTheBot.core.dedupe import HashIndex
+from DecodeTheBot.models.episode_m import Episode
+from DecodeTheBot.models.guru_m import Guru
+from DecodeTheBot.models.meta import Watermark
+from DecodeTheBot.models.reddit_m import RedditThread
+from tests.conftest import FakeSubreddit, batch_bot, fake_thread_dict, memory_engine, populate
+
+
+def test_advance_only_moves_forward():
+    with Session(memory_engine()) as session:
+        threads = [RedditThread.model_validate(fake_thread_dict(i)) for i in (5, 9)]
+        assert watermarks.advance(session, RedditThread, threads).key == threads[1].reddit_id
+        older = [RedditThread.model_validate(fake_thread_dict(2))]
+        assert watermarks.advance(session, RedditThread, older) is None
+        session.commit()
+        assert session.get(Watermark, 'reddit').key == threads[1].reddit_id
+
+
+def test_load_seeds_from_newest_rows():
+    with Session(memory_engine()) as session:
+        populate(session, n_episodes=10, n_threads=10)
+        marks = watermarks.load(session)
+    newest_thread = RedditThread.model_validate(fake_thread_dict(9))
+    assert marks[RedditThread].key == newest_thread.reddit_id
+    assert marks[Episode].position == dt.datetime(2000, 1, 10)
+
+
+@pytest.mark.asyncio
+async def test_reddit_fetch_stops_at_mark_and_queues_oldest_first():
+    with Session(memory_engine()) as session:
+        session.add(Guru(name='nobody'))
+        session.commit()
+        bot = batch_bot(session)
+        bot.hash_index[RedditThread] = HashIndex()
+        bot.watermarks = watermarks.load(session)
+        bot.subreddit = FakeSubreddit(n=50)
+
+        await bot.get_reddit_threads()
+        assert bot.subreddit.pulled == 50
+        batch = [bot.reddit_q.get_nowait().item for _ in range(bot.reddit_q.qsize())]
+        assert [_.title for _ in batch[:2]] == ['Submission 0', 'Submission 1']
+        bot.commit_batch(batch, RedditThread, relation_classes=[])
+        assert bot.watermarks[RedditThread].key == 's000049'
+
+        bot.subreddit = FakeSubreddit(n=53)
+        await bot.get_reddit_threads()
+        assert bot.subreddit.pulled == 4
+        assert [bot.reddit_q.get_nowait().item.title for _ in range(3)] == [
+            'Submission 50',
+            'Submission 51',
+            'Submission 52',
+        ]